@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+'''Memory benchmark of the notes of a synthetic notebox, against the representation the compact one replaced
+
+Run with `python -m benchmarks.memory [count]`. Reports the bytes allocated per note, as traced by tracemalloc, and
+exits with an error when the compact representation uses more memory than the legacy one.
+'''
+
+import gc
+import io
+import os
+import sys
+import tempfile
+import contextlib
+import tracemalloc
+from dataclasses import dataclass, field, replace
+from typing import List, Dict, Any
+
+from benchmarks.note_body import legacy_from_string
+from benchmarks.synthetic import DOMAINS, SyntheticContextProvider, folder_layout, generate_notebox
+from notebox.config import Config
+from notebox.context_provider.base import ContextProviderItem
+from notebox.note import Note, NoteType, read_file, content_digest
+from notebox.notebox import Notebox
+
+
+@dataclass
+class LegacyLink:
+    title: str
+    path: str
+
+
+@dataclass
+class LegacyNoteBody:
+    title: str
+    extra_attributes: Dict[str, Any] = field(default_factory=dict)
+    content: str = ""
+    links: List[LegacyLink] = field(default_factory=list)
+    references: List[LegacyLink] = field(default_factory=list)
+
+
+@dataclass
+class LegacyNote:
+    uid: str
+    folder_path: str
+    note_type: NoteType
+    body: LegacyNoteBody
+    provider_item: ContextProviderItem = None
+    domain: str = None
+    flagged: bool = False
+    digest: bytes = None
+
+
+def legacy_load(filepath: str, note_type: NoteType, domain: str, folder_path: str):
+    '''Load a note the way it was before, with its own folder path and link paths
+    '''
+    raw_content = read_file(filepath)
+    body = legacy_from_string(raw_content)
+    return LegacyNote(
+        uid=os.path.split(os.path.splitext(filepath)[0])[-1],
+        folder_path=os.path.abspath(os.path.dirname(filepath)),
+        note_type=note_type,
+        domain=domain,
+        body=LegacyNoteBody(
+            title=body.title,
+            extra_attributes=body.extra_attributes,
+            content=body.content,
+            links=[LegacyLink(l.title, l.path) for l in body.links],
+            references=[LegacyLink(l.title, l.path) for l in body.references],
+        ),
+        digest=content_digest(raw_content),
+    )
+
+
+def compact_load(filepath: str, note_type: NoteType, domain: str, folder_path: str):
+    return Note.load(filepath, note_type, domain, folder_path=folder_path)
+
+
+def load_notes(config: Config, load, keep_raw: bool = True):
+    '''All notes of the notebox of config, with the items of the provider on their context notes
+    '''
+    provider = SyntheticContextProvider(config.context_providers[0].params)
+    notes = []
+    for relative_path, _, collection in folder_layout(DOMAINS):
+        folder_path = os.path.join(config.path, relative_path)
+        domain = relative_path.split(os.sep)[0] if os.sep in relative_path else None
+        note_type = NoteType(os.path.basename(relative_path))
+        items = dict()
+        if collection is not None:
+            items = {
+                f"{item.service}-{item.uid}": item if keep_raw else replace(item, raw=None)
+                for item in provider.get_items(dict(collection=collection))
+            }
+        for filename in sorted(os.listdir(folder_path)):
+            note = load(os.path.join(folder_path, filename), note_type, domain, folder_path)
+            note.provider_item = items.get(note.uid)
+            note.flagged = note.provider_item is not None
+            notes.append(note)
+    return notes
+
+
+def measure(name: str, func, count: int):
+    '''Bytes allocated by func and still in use by what it returns, per note
+    '''
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    per_note = size / count
+    print(f"{name:<28} {per_note:10.0f} bytes/note")
+    return per_note
+
+
+def load_notebox(config: Config):
+    with contextlib.redirect_stdout(io.StringIO()):
+        notebox = Notebox(config)
+        for folder in notebox.folders:
+            folder.ensure_loaded()
+        return notebox
+
+
+def main(count=100000):
+    with tempfile.TemporaryDirectory() as path:
+        config = generate_notebox(path, count)
+        count = sum(len(files) for _, _, files in os.walk(path))
+        print(f"{count} notes")
+
+        legacy = measure("legacy", lambda: load_notes(config, legacy_load), count)
+        compact = measure("compact", lambda: load_notes(config, compact_load), count)
+        compact_without_raw = measure("compact, keep_raw: false", lambda: load_notes(config, compact_load, keep_raw=False), count)
+        print(f"compact uses {compact / legacy:.0%} of legacy, {compact_without_raw / legacy:.0%} without raw payloads")
+
+        # Everything a running notebox keeps around besides the notes, like its indexes, is included from here on
+        measure("notebox", lambda: load_notebox(config), count)
+        config.keep_raw = False
+        measure("notebox, keep_raw: false", lambda: load_notebox(config), count)
+        config.lazy_load = True
+        measure("notebox, lazy_load: true", lambda: load_notebox(config), count)
+
+        assert compact < legacy, "The compact representation uses more memory than the legacy one"
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+'''Round-trip benchmark of NoteBody parsing and serialization against the implementation it replaced
+
+Run with `python -m benchmarks.note_body [count]`. Exits with an error when the current implementation is slower
+than the legacy one, or when both disagree on any of the synthetic notes.
+'''
+
+import io
+import re
+import sys
+import time
+import random
+
+import yaml
+
+from notebox.note import NoteBody, Link, LINKS_HEADER, REFERENCES_HEADER
+
+
+WORDS = (
+    "note idea python memory index graph link source project event meeting zettel context domain parser cache "
+    "thread folder title content footer reference review design plan question answer draft summary"
+).split()
+
+
+def legacy_from_string(raw_content):
+    blocks = raw_content.split('---')
+    front_matter_raw = yaml.load(blocks[1], Loader=yaml.FullLoader)
+    title = front_matter_raw['title']
+    extra_attributes = {k: v for k, v in front_matter_raw.items() if k != 'title'}
+    link_pattern = re.compile(r"\[(.+)\]\((.+)\)")
+    links = []
+    references = []
+    has_footer = True
+    in_links = False
+    in_references = False
+    for n, line in enumerate([l for l in blocks[-1].strip().split('\n') if l != '']):
+        line = line.strip()
+        if n == 0 and line != LINKS_HEADER and line != REFERENCES_HEADER:
+            has_footer = False
+            break
+        elif line == LINKS_HEADER:
+            in_links = True
+            in_references = False
+        elif line == REFERENCES_HEADER:
+            in_links = False
+            in_references = True
+        else:
+            m = link_pattern.search(line)
+            if not m:
+                continue
+            link = Link(m.groups()[0], m.groups()[1])
+            if in_links:
+                links.append(link)
+            elif in_references:
+                references.append(link)
+    content = "---".join(blocks[2:-1] if has_footer else blocks[2:]).strip()
+    return NoteBody(title=title, extra_attributes=extra_attributes, content=content, links=links, references=references)
+
+
+def legacy_to_string(body):
+    stream = io.StringIO()
+    yaml.dump(dict(title=body.title), stream, allow_unicode=True)
+    if body.extra_attributes != dict():
+        yaml.dump(body.extra_attributes, stream, allow_unicode=True)
+    stream.seek(0)
+    lines = ["---", stream.read().strip(), "---", "", body.content]
+    stream.close()
+    if len(body.links) > 0 or len(body.references) > 0:
+        lines.append("\n---")
+    if len(body.links) > 0:
+        lines.append(f"\n{LINKS_HEADER}\n")
+        for link in body.links:
+            lines.append(f"- [{link.title}]({link.path})")
+    if len(body.references) > 0:
+        lines.append(f"\n{REFERENCES_HEADER}\n")
+        for link in body.references:
+            lines.append(f"- [{link.title}]({link.path})")
+    return "\n".join(lines)
+
+
+def synthetic_bodies(count, seed=0):
+    rng = random.Random(seed)
+
+    def sentence(n):
+        return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize()
+
+    for i in range(count):
+        extra_attributes = dict()
+        if rng.random() < 0.3:
+            extra_attributes['author'] = sentence(2)
+        if rng.random() < 0.1:
+            extra_attributes['url'] = f"https://example.com/{rng.choice(WORDS)}?id={i}"
+        yield NoteBody(
+            title=sentence(rng.randint(2, 8)),
+            extra_attributes=extra_attributes,
+            content="\n\n".join(sentence(rng.randint(5, 30)) + "." for _ in range(rng.randint(0, 6))),
+            links=[Link(sentence(3), f"./{rng.randint(0, count)}.md") for _ in range(rng.randint(0, 5))],
+            references=[Link(sentence(3), f"../source/{rng.randint(0, count)}.md") for _ in range(rng.randint(0, 2))],
+        )
+
+
+def measure(func, args):
+    start = time.perf_counter()
+    results = [func(a) for a in args]
+    return results, time.perf_counter() - start
+
+
+def main(count=100000):
+    bodies = list(synthetic_bodies(count))
+
+    raws, legacy_serialize = measure(legacy_to_string, bodies)
+    new_raws, new_serialize = measure(NoteBody.to_string, bodies)
+    legacy_bodies, legacy_parse = measure(legacy_from_string, raws)
+    new_bodies, new_parse = measure(NoteBody.from_string, raws)
+
+    assert new_raws == raws, "Serialization differs from the legacy implementation"
+    assert new_bodies == legacy_bodies == bodies, "Parsing differs from the legacy implementation"
+
+    for name, legacy, new in [("parse", legacy_parse, new_parse), ("serialize", legacy_serialize, new_serialize)]:
+        print(f"{name:>10}: legacy {count / legacy:10.0f} notes/s, current {count / new:10.0f} notes/s ({legacy / new:.1f}x)")
+    assert new_parse < legacy_parse, "Parsing is slower than the legacy implementation"
+    assert new_serialize < legacy_serialize, "Serialization is slower than the legacy implementation"
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+'''Startup benchmark: import time of the REPL module, and the time it takes to get to the first prompt
+
+Run with `python -m benchmarks.startup [notes]`. A notebox with a number of synthetic zettel notes and an online
+Todoist and Gcal provider is set up in a temporary folder, and the REPL is constructed on a headless terminal. Exits
+with an error when a provider client library is imported, or a provider connects or a folder is read before the first
+prompt. Background threads are left to do both.
+'''
+
+import os
+import sys
+import time
+import threading
+import tempfile
+import subprocess
+import statistics
+
+from prompt_toolkit.application import create_app_session
+from prompt_toolkit.input import create_pipe_input
+from prompt_toolkit.output import DummyOutput
+
+from benchmarks.note_body import synthetic_bodies
+from notebox.config import Config
+from notebox.context_provider.lazy import LazyContextProvider
+from notebox.note_folder import NoteFolder
+
+
+HEAVY_MODULES = ["googleapiclient", "google_auth_oauthlib", "todoist"]
+
+IMPORT_SCRIPT = f'''
+import sys, time
+start = time.perf_counter()
+import notebox.repl
+print(time.perf_counter() - start)
+print(",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))
+'''
+
+
+def measure_import(runs=5):
+    durations = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], capture_output=True, text=True, check=True).stdout
+        duration, imported = output.split("\n")[:2]
+        assert imported == "", f"Importing notebox.repl imports {imported}"
+        durations.append(float(duration))
+    return statistics.median(durations)
+
+
+def synthetic_config(path):
+    return Config.from_dict(dict(
+        path=path,
+        editor="true",
+        context_providers=[
+            dict(name="todoist", type="todoist", params=dict(api_key="unused")),
+            dict(name="gcal", type="gcal", params=dict(username="unused", credentials_json_path="unused.json")),
+        ],
+        source=dict(provider="todoist", filter=dict(project="source")),
+        domains=[dict(
+            name="work",
+            event=dict(provider="gcal", filter=dict(calendar="work")),
+            project=dict(provider="todoist", filter=dict(project="work_*")),
+        )],
+    ))
+
+
+def record_main_thread_calls(calls, owner, name):
+    '''Wrap method name of owner to record its calls on the main thread, on which they keep the prompt waiting
+    '''
+    original = getattr(owner, name)
+
+    def wrapper(self, *args, **kwargs):
+        if threading.current_thread() is threading.main_thread():
+            calls.append(owner.__name__)
+        return original(self, *args, **kwargs)
+    setattr(owner, name, wrapper)
+
+
+def main(count=5000):
+    from notebox.repl import ApplicationREPL
+
+    calls = []
+    record_main_thread_calls(calls, LazyContextProvider, "get_items")
+    record_main_thread_calls(calls, NoteFolder, "pull")
+
+    import_time = measure_import()
+    print(f"    import: {import_time * 1000:8.1f} ms")
+
+    with tempfile.TemporaryDirectory() as path:
+        os.makedirs(os.path.join(path, "zettel"))
+        for n, body in enumerate(synthetic_bodies(count)):
+            with open(os.path.join(path, "zettel", f"{n}.md"), 'w') as f:
+                f.write(body.to_string())
+        config = synthetic_config(path)
+
+        with create_pipe_input() as pipe_input, create_app_session(input=pipe_input, output=DummyOutput()):
+            start = time.perf_counter()
+            repl = ApplicationREPL(config)
+            first_prompt = time.perf_counter() - start
+            print(f"    prompt: {first_prompt * 1000:8.1f} ms ({count} notes)")
+
+            assert LazyContextProvider.__name__ not in calls, "A provider connected"
+            assert NoteFolder.__name__ not in calls, "A folder was read"
+
+            while repl.refresher.busy:
+                time.sleep(0.001)
+            print(f"first use: {(time.perf_counter() - start) * 1000:8.1f} ms (completion ready)")
+            repl.notebox.unwatch()
+            repl.notebox.sync_thread.join()
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
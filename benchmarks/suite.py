@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+'''Benchmark suite over synthetic noteboxes, timing the hot paths of notebox
+
+Run with `python -m benchmarks.suite [--sizes 1000 10000 100000] [--output results.json] [--compare previous.json]`.
+Results are printed, and written as JSON when an output file is given, so runs on different commits can be compared.
+'''
+
+import io
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import platform
+import contextlib
+import subprocess
+
+from benchmarks.synthetic import generate_notebox
+from notebox.note import NoteBody, NoteType
+from notebox.note_folder import NoteFolder
+from notebox.notebox import Notebox
+from notebox.snapshot import write_snapshot
+from notebox.repl import BackgroundRefresher, Command, NoteCompleter
+
+
+class Suite:
+
+    def __init__(self):
+        self.results = []
+
+    def measure(self, size: int, name: str, func, operations: int = 1):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func()
+            seconds = time.perf_counter() - start
+        self.results.append(dict(size=size, name=name, seconds=seconds, operations=operations, per_operation=seconds / operations))
+        print(f"{size:>8} {name:<20} {seconds * 1000:10.1f} ms {seconds / operations * 1e6:12.1f} us/op")
+        return result
+
+    def run(self, size: int, seed: int = 0):
+        rng = random.Random(seed)
+        with tempfile.TemporaryDirectory() as path:
+            config = generate_notebox(path, size, seed=seed)
+
+            notebox = self.measure(size, "notebox_init", lambda: Notebox(config))
+            self.measure(size, "notebox_load", lambda: [folder.ensure_loaded() for folder in notebox.folders])
+
+            config.snapshot_path = os.path.join(path, "snapshot.bin")
+            self.measure(size, "snapshot_write", lambda: write_snapshot(config.snapshot_path, notebox.folders))
+            restored = self.measure(size, "snapshot_init", lambda: Notebox(config))
+            self.measure(size, "snapshot_load", lambda: [folder.ensure_loaded() for folder in restored.folders])
+
+            zettel_path = os.path.join(path, "zettel")
+            folder = self.measure(size, "folder_pull_cold", lambda: NoteFolder(zettel_path, NoteType.ZETTEL))
+            self.measure(size, "folder_pull_warm", folder.pull)
+            self.measure(size, "folder_push_clean", folder.push)
+            dirty = rng.sample(folder.notes, len(folder.notes) // 10)
+            for note in dirty:
+                note.body.content += "\n\nEdited."
+            self.measure(size, "folder_push_dirty", folder.push, len(dirty))
+
+            raws = []
+            for note in folder.notes:
+                with open(note.filepath) as f:
+                    raws.append(f.read())
+            bodies = self.measure(size, "body_from_string", lambda: [NoteBody.from_string(r) for r in raws], len(raws))
+            self.measure(size, "body_to_string", lambda: [b.to_string() for b in bodies], len(bodies))
+
+            refresher = BackgroundRefresher()
+            completer = NoteCompleter([Command("zettel", None, notebox.zettel)], refresher)
+            refresher.request(notebox.zettel, pull=False)
+            while refresher.busy:
+                time.sleep(0.01)
+            queries = [
+                word[:length]
+                for note in rng.sample(notebox.zettel.notes, 20)
+                for word in note.body.title.lower().split(" ")[:2]
+                for length in range(1, len(word) + 1)
+            ]
+            self.measure(size, "fuzzy_match", lambda: [list(completer.fuzzy_match(q, notebox.zettel, len(q))) for q in queries], len(queries))
+
+            pairs = [tuple(rng.sample(notebox.zettel.notes, 2)) for _ in range(100)]
+            self.measure(size, "link", lambda: [notebox.link(a, b) for a, b in pairs], len(pairs))
+
+            for _ in range(max(1, size // 100)):
+                notebox.zettel.create(f"Empty {rng.random()}", f"empty-{rng.getrandbits(64):x}")
+            self.measure(size, "clean", notebox.clean)
+            notebox.unwatch()
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument("--compare", help="JSON file of a previous run to compare the results with")
+    args = parser.parse_args()
+
+    suite = Suite()
+    for size in args.sizes:
+        suite.run(size)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        previous_seconds = {(r['size'], r['name']): r['seconds'] for r in previous['results']}
+        print(f"Compared with {previous.get('commit')}")
+        for result in suite.results:
+            before = previous_seconds.get((result['size'], result['name']))
+            if before is not None:
+                print(f"{result['size']:>8} {result['name']:<20} {result['seconds'] / before:6.2f}x the time")
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(dict(
+                commit=git_commit(),
+                python=platform.python_version(),
+                platform=platform.platform(),
+                time=time.time(),
+                results=suite.results,
+            ), f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+'''Synthetic noteboxes with the real folder layout, and a context provider serving their items without a service
+
+Run with `python -m benchmarks.synthetic path [count]` to generate a notebox to try things on by hand.
+'''
+
+import os
+import sys
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Any, List
+
+from benchmarks.note_body import synthetic_bodies
+from notebox.config import Config
+from notebox.context_provider import context_provider_map
+from notebox.context_provider.base import ContextProvider, ContextProviderItem
+from notebox.note import Link
+
+
+DOMAINS = ["personal", "acme"]
+
+# Share of all notes per folder, the rest is spread evenly over the folders of the domains
+FOLDER_SHARES = dict(zettel=0.5, source=0.15, daily=0.05)
+
+# Share of the notes of a context folder which the provider still has an item for
+OPEN_SHARE = 0.5
+
+
+class SyntheticContextProvider(ContextProvider):
+    '''Items of which the titles match the notes generated for the collection in the filter
+    '''
+
+    def __init__(self, params):
+        self.open_items = params['open_items']
+
+    def get_items(self, filters: Dict[str, Any]):
+        collection = filters['collection']
+        return [
+            ContextProviderItem(
+                title=item_title(collection, n),
+                uid=f"{collection}-{n}",
+                collection=collection,
+                service="synthetic",
+                raw=item_payload(collection, n),
+            )
+            for n in range(self.open_items.get(collection, 0))
+        ]
+
+
+context_provider_map['synthetic'] = "benchmarks.synthetic:SyntheticContextProvider"
+
+
+def item_title(collection: str, n: int):
+    return f"{collection} task {n}"
+
+
+def item_payload(collection: str, n: int):
+    '''API payload of an item, shaped like a Todoist task
+    '''
+    return dict(
+        id=f"{collection}-{n}",
+        content=item_title(collection, n),
+        description="",
+        project_id=collection,
+        section_id=None,
+        parent_id=None,
+        labels=[],
+        priority=1 + n % 4,
+        checked=0,
+        date_added=(datetime(2020, 1, 1) + timedelta(hours=n)).isoformat() + "Z",
+        url=f"https://example.com/tasks/{collection}-{n}",
+    )
+
+
+def folder_layout(domains: List[str]):
+    '''Relative folder paths with their share of the notes and their provider collection, if any
+    '''
+    layout = [("zettel", FOLDER_SHARES['zettel'], None), ("source", FOLDER_SHARES['source'], "source"), ("daily", FOLDER_SHARES['daily'], None)]
+    domain_share = (1 - sum(FOLDER_SHARES.values())) / len(domains) / 3
+    for domain in domains:
+        layout.extend([
+            (os.path.join(domain, "event"), domain_share, f"{domain}_event"),
+            (os.path.join(domain, "project"), domain_share, f"{domain}_project"),
+            (os.path.join(domain, "zettel"), domain_share, None),
+        ])
+    return layout
+
+
+def generate_notebox(path: str, count: int, domains: List[str] = DOMAINS, seed: int = 0) -> Config:
+    '''Write count notes into a notebox at path, and return its config
+    '''
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    layout = folder_layout(domains)
+
+    notes = []
+    open_items = dict()
+    for folder, share, collection in layout:
+        folder_count = max(1, round(count * share))
+        for n in range(folder_count):
+            if collection is not None:
+                uid = f"synthetic-{collection}-{n}"
+            elif folder == "daily":
+                uid = (start + timedelta(days=n)).strftime("%Y-%m-%d")
+            else:
+                uid = (start + timedelta(seconds=len(notes))).strftime("%Y%m%d%H%M%S")
+            notes.append((folder, uid, collection, n))
+        if collection is not None:
+            open_items[collection] = int(folder_count * OPEN_SHARE)
+
+    bodies = list(synthetic_bodies(len(notes), seed))
+    titles = dict()
+    for (folder, uid, collection, n), body in zip(notes, bodies):
+        if collection is not None:
+            body.title = item_title(collection, n)
+        titles[folder, uid] = body.title
+
+    zettels = [(folder, uid) for folder, uid, _, _ in notes if folder.endswith("zettel")]
+    contexts = [(folder, uid) for folder, uid, _, _ in notes if not folder.endswith("zettel")]
+    for (folder, uid, _, _), body in zip(notes, bodies):
+        folder_path = os.path.join(path, folder)
+        body.links = [
+            Link(titles[f, u], os.path.relpath(os.path.join(path, f, u + ".md"), folder_path))
+            for f, u in rng.sample(zettels, min(len(body.links), len(zettels)))
+        ]
+        body.references = [
+            Link(titles[f, u], os.path.relpath(os.path.join(path, f, u + ".md"), folder_path))
+            for f, u in rng.sample(contexts, min(len(body.references), len(contexts)))
+        ]
+        os.makedirs(folder_path, exist_ok=True)
+        with open(os.path.join(folder_path, uid + ".md"), 'w') as f:
+            f.write(body.to_string())
+
+    return Config.from_dict(dict(
+        path=path,
+        editor="true",
+        context_providers=[dict(name="synthetic", type="synthetic", params=dict(open_items=open_items))],
+        source=dict(provider="synthetic", filter=dict(collection="source")),
+        domains=[
+            dict(
+                name=domain,
+                event=dict(provider="synthetic", filter=dict(collection=f"{domain}_event")),
+                project=dict(provider="synthetic", filter=dict(collection=f"{domain}_project")),
+            )
+            for domain in domains
+        ],
+    ))
+
+
+if __name__ == "__main__":
+    generate_notebox(sys.argv[1], *[int(a) for a in sys.argv[2:]])
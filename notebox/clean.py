@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+import os
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import yaml
+
+from notebox.note import NoteBody, LazyNoteBody, MalformedNoteException, FRONT_MATTER_DELIMITER, _find_delimiter
+from notebox.note_folder import NoteFolder
+
+
+# Notes with more than this after their front matter have content, like an empty footer would be well within it
+MAX_EMPTY_BODY_SIZE = 64
+# Bytes read to find the end of the front matter, beyond which files are only read when they might be empty
+HEAD_SIZE = 512
+
+
+@dataclass
+class CleanResult:
+    folder: NoteFolder
+    scanned: int = 0
+    candidates: int = 0
+    empty: List[str] = field(default_factory=list)
+
+
+def is_empty_note(raw_content: str):
+    '''Whether a note has no content, links or references, only parsing it when something follows the front matter
+    '''
+    start = raw_content.find('\n')
+    if start < 0 or raw_content[:start].strip() != FRONT_MATTER_DELIMITER:
+        return False
+    end = _find_delimiter(raw_content, start, len(raw_content))
+    if end < 0:
+        return False
+    if raw_content[end + len(FRONT_MATTER_DELIMITER):].strip() == "":
+        return True
+    try:
+        body = NoteBody.from_string(raw_content)
+    except (MalformedNoteException, yaml.YAMLError, KeyError):
+        return False
+    return len(body.content) == 0 and len(body.links) == 0 and len(body.references) == 0
+
+
+def front_matter_end(head: bytes):
+    '''Offset of the end of the line closing the front matter in head, or -1 when it isn't in there
+    '''
+    start = head.find(b'\n')
+    if start < 0 or head[:start].strip() != FRONT_MATTER_DELIMITER.encode():
+        return -1
+    pos = start
+    while True:
+        pos = head.find(b'\n' + FRONT_MATTER_DELIMITER.encode(), pos)
+        if pos < 0:
+            return -1
+        line_end = head.find(b'\n', pos + 1)
+        if line_end < 0:
+            return -1
+        if head[pos + 1:line_end].strip() == FRONT_MATTER_DELIMITER.encode():
+            return line_end
+        pos += 1
+
+
+def read_if_possibly_empty(path: str, size: int):
+    '''Text of a note file which might be empty, or None when what follows its front matter is too large for that
+
+    Only the start of the file is read to rule it out.
+    '''
+    with open(path, 'rb') as f:
+        head = f.read(HEAD_SIZE)
+        end = front_matter_end(head)
+        if end >= 0 and size - end > MAX_EMPTY_BODY_SIZE:
+            return None
+        return (head + f.read()).decode()
+
+
+def clean_folder(folder: NoteFolder, dry_run: bool = False):
+    '''Find, and unless dry_run remove, the empty notes of a folder, keeping the folder up to date
+    '''
+    result = CleanResult(folder)
+    if not os.path.isdir(folder.path):
+        return result
+    empty_paths = []
+    for entry in folder.scan():
+        result.scanned += 1
+        try:
+            stat = entry.stat()
+            # Notes in memory which aren't empty are skipped, while the file of an empty one is still checked
+            note = folder.current_note(entry.name[:-3], stat)
+            if note is not None and not (isinstance(note.body, LazyNoteBody) and not note.body.is_loaded) and not note.is_empty:
+                continue
+            raw_content = read_if_possibly_empty(entry.path, stat.st_size)
+            if raw_content is None:
+                continue
+            result.candidates += 1
+            if is_empty_note(raw_content):
+                result.empty.append(entry.name[:-3])
+                empty_paths.append(entry.path)
+        except FileNotFoundError:
+            continue
+    if not dry_run:
+        for uid, path in zip(result.empty, empty_paths):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            folder.forget_note(uid)
+    return result
+
+
+def clean_folders(folders: List[NoteFolder], dry_run: bool = False, max_workers: int = 8) -> List[CleanResult]:
+    '''Clean all folders in parallel
+    '''
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="Clean") as executor:
+        return list(executor.map(lambda folder: clean_folder(folder, dry_run), folders))
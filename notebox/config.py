@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import os
 from dataclasses import dataclass
 from typing import Dict, List, Any
 
@@ -11,13 +12,15 @@ class ContextProviderConfig:
     name: str
     type: str
     params: Dict[str, Any]
+    timeout: float = 30
 
     @classmethod
     def from_dict(cls, d: Dict):
         return cls(
             name=d['name'],
             type=d['type'],
-            params=d.get('params', dict())
+            params=d.get('params', dict()),
+            timeout=d.get('timeout', 30),
         )
 
 
@@ -26,13 +29,15 @@ class ContextFolderConfig:
     provider: str
     title_format: str
     filter: Dict[str, Any]
+    comments: bool = False
 
     @classmethod
     def from_dict(cls, d: Dict):
         return cls(
             provider=d['provider'],
             title_format=d.get('title_format', "{title}"),
-            filter=d.get('filter', dict())
+            filter=d.get('filter', dict()),
+            comments=d.get('comments', False),
         )
 
 
@@ -51,6 +56,21 @@ class DomainConfig:
         )
 
 
+@dataclass
+class CacheConfig:
+    path: str
+    ttl: float
+    offline: bool
+
+    @classmethod
+    def from_dict(cls, d: Dict):
+        return cls(
+            path=d.get('path', os.path.join("~", ".notebox", "cache")),
+            ttl=d.get('ttl', 900),
+            offline=d.get('offline', False) or os.getenv('NOTEBOX_OFFLINE', '0') == '1',
+        )
+
+
 @dataclass
 class Config:
     path: str
@@ -58,6 +78,14 @@ class Config:
     context_providers: List[ContextProviderConfig]
     source: ContextFolderConfig
     domains: List[DomainConfig]
+    index_path: str = None
+    lazy_load: bool = False
+    layout: str = "flat"
+    keep_raw: bool = True
+    snapshot_path: str = None
+    cache: CacheConfig = None
+    stats: bool = False
+    profile_path: str = None
 
     @classmethod
     def from_dict(cls, d: Dict):
@@ -67,6 +95,14 @@ class Config:
             context_providers=[ContextProviderConfig.from_dict(ds) for ds in d['context_providers']],
             source=ContextFolderConfig.from_dict(d['source']),
             domains=[DomainConfig.from_dict(ds) for ds in d['domains']],
+            index_path=d.get('index_path'),
+            lazy_load=d.get('lazy_load', False),
+            layout=d.get('layout', "flat"),
+            keep_raw=d.get('keep_raw', True),
+            snapshot_path=d.get('snapshot_path'),
+            cache=CacheConfig.from_dict(d['cache']) if d.get('cache') is not None else None,
+            stats=d.get('stats', False) or os.getenv('NOTEBOX_STATS', '0') == '1',
+            profile_path=os.getenv('NOTEBOX_PROFILE', d.get('profile_path')),
         )
     
     @classmethod
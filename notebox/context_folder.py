@@ -1,27 +1,40 @@
 #!/usr/bin/env python3
 
 import os
-from typing import Dict
+from dataclasses import replace
+from typing import Dict, List
 
 from notebox.config import ContextFolderConfig
 from notebox.context_provider.base import ContextProvider, ContextProviderItem
-from notebox.note_folder import NoteFolder
-from notebox.note import NoteType
+from notebox.context_provider.cache import CachedContextProvider
+from notebox.note_folder import NoteFolder, NoteLayout
+from notebox.note_index import NoteIndex
+from notebox.note import Note, NoteType
+from notebox.stats import stats, timed
 
 
 class ContextFolder(NoteFolder):
 
-    def __init__(self, config: ContextFolderConfig, path: str, context_providers: Dict[str, ContextProvider], note_type=NoteType, domain: str = None):
+    def __init__(self, config: ContextFolderConfig, path: str, context_providers: Dict[str, ContextProvider], note_type=NoteType, domain: str = None, index: NoteIndex = None, lazy: bool = False, defer: bool = False, layout: NoteLayout = NoteLayout.FLAT, keep_raw: bool = True):
         if config is not None:
+            self.provider_name = config.provider
             self.provider: ContextProvider = context_providers[config.provider]
             self.provider_filter: str = config.filter
             self.title_format = config.title_format
+            self.comments = config.comments
         else:
+            self.provider_name = None
             self.provider = None
             self.provider_filter = None
             self.title_format = "{title}"
+            self.comments = False
+        self.provider_items: List[ContextProviderItem] = None
+        # Without it, the payloads of the provider are dropped from the items, which the notes only use for their fields
+        self.keep_raw = keep_raw
+        if isinstance(self.provider, CachedContextProvider):
+            self.provider.subscribe(self.on_provider_refresh)
 
-        super().__init__(path, note_type, domain)
+        super().__init__(path, note_type, domain, index, lazy, defer, layout)
 
     def get_uid_from_attributes(self, context_provider_item: ContextProviderItem):
         return "-".join([
@@ -34,21 +47,65 @@ class ContextFolder(NoteFolder):
             if e is not None
         ])
 
+    @timed("ContextFolder.pull")
     def pull(self):
+        '''Read the notes in path, and match them with the last items fetched from the provider
+        '''
         super().pull()
+        if self.provider_items is not None:
+            self.reconcile(self.provider_items)
 
+    def fetch_items(self):
+        with stats.timer(f"ContextProvider.get_items[{self.provider_name}]"):
+            return self.provider.get_items(self.provider_filter)
+
+    def sync(self, provider_items: List[ContextProviderItem] = None):
+        '''Match the notes with the items of the provider, fetching them unless they are passed
+        '''
         if self.provider is None:
             return
+        if provider_items is None:
+            provider_items = self.fetch_items()
+        if not self.keep_raw:
+            provider_items = [replace(item, raw=None) if item.raw is not None else item for item in provider_items]
+        self.provider_items = provider_items
+        self.reconcile(provider_items)
+
+    def on_provider_refresh(self, filters: Dict, provider_items: List[ContextProviderItem]):
+        if filters == self.provider_filter:
+            self.sync(provider_items)
+
+    def set_comments(self, note: Note, comments: List[str]):
+        '''Keep the comments of the provider item of note in its comments attribute
+        '''
+        if note.body.extra_attributes.get('comments', []) == comments:
+            return
+        if len(comments) == 0:
+            del note.body.extra_attributes['comments']
+        else:
+            note.body.extra_attributes['comments'] = comments
+        self.update(note)
 
-        for provider_item in self.provider.get_items(self.provider_filter):
-            note_title = self.title_format.format(**provider_item.__dict__)
-            uid = self.get_uid_from_attributes(provider_item)
-            try:
-                note = self.notes_by_id[uid]
-                note.body.title = note_title
-                note.push()
-            except KeyError:
-                note = self.create(note_title, uid)
-            note.provider_item = provider_item
-            note.flagged = True
+    def reconcile(self, provider_items: List[ContextProviderItem]):
+        '''Flag the note of every provider item, creating it or updating its title and comments where needed
+        '''
+        with self.lock:
+            for note in self.notes:
+                note.provider_item = None
+                note.flagged = False
 
+            for provider_item in provider_items:
+                note_title = self.title_format.format(**provider_item.__dict__)
+                uid = self.get_uid_from_attributes(provider_item)
+                try:
+                    note = self.notes_by_id[uid]
+                    if note.body.title != note_title:
+                        self.set_title(note, note_title)
+                    if self.comments:
+                        self.set_comments(note, provider_item.comments)
+                    self.push_note(note)
+                except KeyError:
+                    extra_attributes = dict(comments=provider_item.comments) if self.comments and provider_item.comments else None
+                    note = self.create(note_title, uid, extra_attributes)
+                note.provider_item = provider_item
+                note.flagged = True
@@ -1,18 +1,38 @@
 #!/usr/bin/env python3
 
-from notebox.config import ContextProviderConfig
-from notebox.context_provider.gcal import ContextProviderGcal
-from notebox.context_provider.todoist import ContextProviderTodoist
-from notebox.context_provider.daily import ContextProviderDaily
+import importlib
 
+from notebox.config import ContextProviderConfig, CacheConfig
+from notebox.context_provider.cache import CachedContextProvider
+from notebox.context_provider.lazy import LazyContextProvider
 
+
+# Provider classes by type, as "module:class", so the client libraries of a provider are only imported when it's used
 context_provider_map = dict(
-    daily=ContextProviderDaily,
-    gcal=ContextProviderGcal,
-    todoist=ContextProviderTodoist
+    daily="notebox.context_provider.daily:ContextProviderDaily",
+    gcal="notebox.context_provider.gcal:ContextProviderGcal",
+    todoist="notebox.context_provider.todoist:ContextProviderTodoist",
 )
 
+# Providers which are computed locally, and gain nothing from a cache
+uncached_context_provider_types = {'daily'}
+
+
+def context_provider_class(provider_type: str):
+    module_name, class_name = context_provider_map[provider_type].split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
 
-def context_provider_factory(config: ContextProviderConfig):
-    return context_provider_map[config.type](config.params)
+def context_provider_factory(config: ContextProviderConfig, cache: CacheConfig = None):
+    '''Provider for config, which imports its module and connects on first use, unless it's computed locally
+    '''
+    if config.type not in context_provider_map:
+        raise KeyError(config.type)
 
+    def factory():
+        return context_provider_class(config.type)(config.params)
+    if config.type in uncached_context_provider_types:
+        return factory()
+    if cache is None:
+        return LazyContextProvider(factory)
+    return CachedContextProvider(config.name, factory, cache.path, cache.ttl, cache.offline)
@@ -17,6 +17,7 @@ class ContextProviderItem:
     created_time: datetime = None
     start_time: datetime = None
     end_time: datetime = None
+    comments: List[str] = field(default_factory=list)
     raw: Any = None
 
 
@@ -28,3 +29,8 @@ class ContextProvider:
     def get_items(self, filters: Dict[str, Any]):
         raise NotImplementedError
 
+    def invalidate(self):
+        '''Drop anything the provider cached, so the next get_items fetches fresh items
+        '''
+        pass
+
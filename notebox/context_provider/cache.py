@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+import pickle
+import hashlib
+import logging
+import tempfile
+import threading
+from typing import Dict, Any, Callable, List
+
+from notebox.context_provider.base import ContextProvider, ContextProviderItem
+from notebox.context_provider.lazy import LazyContextProvider
+
+
+logger = logging.getLogger(__name__)
+
+
+class ContextProviderOffline(Exception):
+    pass
+
+
+class CachedContextProvider(LazyContextProvider):
+    '''Wraps a provider, keeping the items it returns on disk per filter
+
+    Fresh cached items are returned as they are. Stale ones are returned as well, while they are refreshed in the
+    background, after which subscribers are called with the new items. The wrapped provider is only constructed when
+    items have to be fetched, which never happens in offline mode.
+    '''
+
+    def __init__(self, name: str, factory: Callable[[], ContextProvider], cache_path: str, ttl: float, offline: bool = False):
+        super().__init__(factory)
+        self.name = name
+        self.cache_path = os.path.expanduser(cache_path)
+        self.ttl = ttl
+        self.offline = offline
+        self.subscribers = []
+        self._invalidated_at = 0
+        self._revalidating = set()
+        self.lock = threading.Lock()
+
+    def subscribe(self, callback: Callable[[Dict[str, Any], List[ContextProviderItem]], None]):
+        '''Call callback with the filters and items of every background refresh
+        '''
+        self.subscribers.append(callback)
+
+    def invalidate(self):
+        self._invalidated_at = time.time()
+        super().invalidate()
+
+    def cache_filepath(self, filters: Dict[str, Any]):
+        key = hashlib.sha1(json.dumps(filters, sort_keys=True, default=str).encode()).hexdigest()
+        return os.path.join(self.cache_path, f"{self.name}-{key}.pickle")
+
+    def read_cache(self, filters: Dict[str, Any]):
+        '''Time the items were fetched and the items, or None when nothing is cached
+        '''
+        try:
+            with open(self.cache_filepath(filters), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def write_cache(self, filters: Dict[str, Any], items: List[ContextProviderItem]):
+        os.makedirs(self.cache_path, exist_ok=True)
+        fd, tmp_filepath = tempfile.mkstemp(dir=self.cache_path, prefix=".", suffix=".tmp")
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((time.time(), items), f)
+        os.replace(tmp_filepath, self.cache_filepath(filters))
+
+    def fetch(self, filters: Dict[str, Any]):
+        items = self.provider.get_items(filters)
+        self.write_cache(filters, items)
+        return items
+
+    def get_items(self, filters: Dict[str, Any]):
+        cached = self.read_cache(filters)
+        if self.offline:
+            if cached is None:
+                raise ContextProviderOffline(f"No cached items of {self.name} for {filters}")
+            return cached[1]
+        if cached is None or cached[0] <= self._invalidated_at:
+            return self.fetch(filters)
+        fetched_at, items = cached
+        if time.time() - fetched_at > self.ttl:
+            self.revalidate_in_background(filters)
+        return items
+
+    def revalidate_in_background(self, filters: Dict[str, Any]):
+        key = self.cache_filepath(filters)
+        with self.lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+        threading.Thread(target=self._revalidate, args=(filters, key), name=f"Revalidate-{self.name}", daemon=True).start()
+
+    def _revalidate(self, filters: Dict[str, Any], key: str):
+        try:
+            items = self.fetch(filters)
+            for callback in self.subscribers:
+                callback(filters, items)
+        except Exception:
+            logger.exception(f"Failed to refresh items of {self.name}")
+        finally:
+            with self.lock:
+                self._revalidating.discard(key)
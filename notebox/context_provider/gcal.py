@@ -2,10 +2,12 @@
 
 import os
 import pickle
+import threading
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 
@@ -13,11 +15,25 @@ from notebox.context_provider.base import ContextProvider, ContextProviderItem
 
 
 class ContextProviderGcal(ContextProvider):
+    '''Items are the events of a calendar which overlap a window of days around today
+
+    The first fetch of a calendar lists the window in full. Later fetches only ask for the events which changed since,
+    using the sync token of the previous fetch, until the window moves to another day or the token expires.
+    '''
 
     def __init__(self, params):
-        username = params['username']
-        creds_fp = params['credentials_json_path']
+        self.username = params['username']
+        self.days_back = params.get('days_back', 0)
+        self.days_forward = params.get('days_forward', 1)
+        self.calendar = self._connect(params['credentials_json_path'])
+        self.lock = threading.Lock()
+        self.windows: Dict[str, Tuple[datetime, datetime]] = dict()
+        self.sync_tokens: Dict[str, str] = dict()
+        self.events: Dict[str, Dict[str, Any]] = dict()
+
+        print(f'Connected to Gcal account {self.username}')
 
+    def _connect(self, creds_fp: str):
         token_fp = os.path.splitext(creds_fp)[0] + ".pickle"
         creds = None
         if os.path.exists(token_fp):
@@ -35,15 +51,20 @@ class ContextProviderGcal(ContextProvider):
             with open(token_fp, 'wb') as token:
                 pickle.dump(creds, token)
 
-        self.calendar = build('calendar', 'v3', credentials=creds)
-        self.username = username
+        return build('calendar', 'v3', credentials=creds)
 
-        print(f'Connected to Gcal account {self.username}')
+    @staticmethod
+    def _parse_time(raw_time: Dict[str, str]):
+        '''Time of a timed event, or local midnight of the day of an all-day event
+        '''
+        if 'dateTime' in raw_time:
+            return datetime.fromisoformat(raw_time['dateTime'].replace('Z', '+00:00'))
+        return datetime.fromisoformat(raw_time['date']).astimezone()
 
     def _convert_to_item(self, raw, collection):
-        title = raw['summary'].strip()
-        start_time = datetime.fromisoformat(raw['start']['dateTime'])
-        end_time = datetime.fromisoformat(raw['end']['dateTime'])
+        title = raw.get('summary', '').strip()
+        start_time = self._parse_time(raw['start'])
+        end_time = self._parse_time(raw['end'])
         return ContextProviderItem(
             title=title,
             uid=raw["id"],
@@ -55,17 +76,60 @@ class ContextProviderGcal(ContextProvider):
             raw=raw,
         )
 
+    def window(self):
+        start = datetime.now().astimezone().replace(hour=0, minute=0, second=0, microsecond=0)
+        return start - timedelta(days=self.days_back), start + timedelta(days=self.days_forward)
+
+    def _list(self, **kwargs):
+        '''All events of a list request, following its pages, and the sync token of its last page
+        '''
+        events = []
+        page_token = None
+        while True:
+            result = self.calendar.events().list(singleEvents=True, pageToken=page_token, **kwargs).execute()
+            events.extend(result.get('items', []))
+            page_token = result.get('nextPageToken')
+            if page_token is None:
+                return events, result.get('nextSyncToken')
+
+    def _sync(self, calendar: str, window: Tuple[datetime, datetime]):
+        if self.windows.get(calendar) == window and self.sync_tokens.get(calendar) is not None:
+            try:
+                changed, sync_token = self._list(calendarId=calendar, syncToken=self.sync_tokens[calendar])
+            except HttpError as e:
+                if e.resp.status != 410:
+                    raise
+                # The sync token expired, so the window has to be listed in full again
+                self.sync_tokens[calendar] = None
+                return self._sync(calendar, window)
+            events = self.events[calendar]
+            for raw in changed:
+                if raw.get('status') == 'cancelled':
+                    events.pop(raw['id'], None)
+                else:
+                    events[raw['id']] = raw
+        else:
+            listed, sync_token = self._list(
+                calendarId=calendar,
+                timeMin=window[0].isoformat(),
+                timeMax=window[1].isoformat(),
+            )
+            self.events[calendar] = {raw['id']: raw for raw in listed if raw.get('status') != 'cancelled'}
+        self.windows[calendar] = window
+        self.sync_tokens[calendar] = sync_token
+
     def get_items(self, filters: Dict[str, Any]):
         if set(filters.keys()) != {"calendar"}:
             raise ValueError("Gcal filters should contain a single key 'calendar'")
-        start = datetime.now().replace(hour=0, minute=0, second=0)
-        end = start + timedelta(days=1)
-        events_result = self.calendar.events().list(
-            calendarId=filters['calendar'],
-            timeMin=start.isoformat() + 'Z',
-            timeMax=end.isoformat() + 'Z',
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-        return [self._convert_to_item(raw, filters['calendar']) for raw in events_result.get("items", [])]
+        calendar = filters['calendar']
+        window = self.window()
+        with self.lock:
+            self._sync(calendar, window)
+            items = [self._convert_to_item(raw, calendar) for raw in self.events[calendar].values()]
+        # Changed events are not limited to the window, so they are filtered here
+        items = [i for i in items if i.end_time > window[0] and i.start_time < window[1]]
+        return sorted(items, key=lambda i: i.start_time)
 
+    def invalidate(self):
+        with self.lock:
+            self.sync_tokens.clear()
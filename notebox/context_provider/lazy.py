@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+import threading
+from typing import Dict, Any, Callable
+
+from notebox.context_provider.base import ContextProvider
+
+
+class LazyContextProvider(ContextProvider):
+    '''Stands in for a provider, which is only constructed, and so connects to its service, when items are first asked
+    '''
+
+    def __init__(self, factory: Callable[[], ContextProvider]):
+        self.factory = factory
+        self._provider = None
+        self.provider_lock = threading.Lock()
+
+    @property
+    def provider(self) -> ContextProvider:
+        with self.provider_lock:
+            if self._provider is None:
+                self._provider = self.factory()
+            return self._provider
+
+    @property
+    def connected(self):
+        return self._provider is not None
+
+    def get_items(self, filters: Dict[str, Any]):
+        return self.provider.get_items(filters)
+
+    def invalidate(self):
+        if self._provider is not None:
+            self._provider.invalidate()
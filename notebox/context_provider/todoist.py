@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
+import os
 import re
+import time
+import threading
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List
 from fnmatch import fnmatch
 
 import todoist
@@ -10,59 +13,80 @@ from notebox.context_provider.base import ContextProvider, ContextProviderItem
 
 
 class ContextProviderTodoist(ContextProvider):
-
-    def __init__(self, params):
-        self.client = todoist.TodoistAPI(params['api_key'])
-        self.client.sync()
+    '''Items are the open top level tasks of a Todoist account
+
+    The client syncs incrementally with the sync token of the previous sync, which it keeps on disk between runs. A
+    sync, and the items converted from it, are shared by every call to get_items within sync_interval seconds, so all
+    folders of a single notebox sync cause one request at most.
+    '''
+
+    def __init__(self, params, session=None):
+        self.client = todoist.TodoistAPI(
+            params['api_key'],
+            session=session,
+            cache=os.path.join(os.path.expanduser(params.get('cache', os.path.join("~", ".todoist-sync"))), ""),
+        )
+        self.sync_interval = params.get('sync_interval', 10)
+        self.lock = threading.Lock()
+        self.synced_at = None
+        self.items: List[ContextProviderItem] = []
+        self.project_name_by_id: Dict[Any, str] = dict()
+        self.label_name_by_id: Dict[Any, str] = dict()
+        self.section_name_by_id: Dict[Any, str] = dict()
+        self.comments_by_item_id: Dict[Any, List[Any]] = dict()
+        self._sync()
         print(f"Connected to Todoist account {self.client.state['user']['email']}")
 
-    @property
-    def _project_name_by_id(self):
-        return {p['id']: p['name'] for p in self.client.state['projects']}
-
-    @property
-    def _project_id_by_name(self):
-        return {p['name']: p['id'] for p in self.client.state['projects']}
-
-    @property
-    def _label_name_by_id(self):
-        return {p['id']: p['name'] for p in self.client.state['labels']}
+    def _sync(self):
+        '''Fetch what changed since the previous sync, and rebuild the lookup tables and items
+        '''
+        self.client.sync()
+        state = self.client.state
+        self.project_name_by_id = {p['id']: p['name'] for p in state['projects']}
+        self.label_name_by_id = {p['id']: p['name'] for p in state['labels']}
+        self.section_name_by_id = {p['id']: p['name'] for p in state['sections']}
+        self.comments_by_item_id = dict()
+        for comment in sorted(state['notes'], key=lambda n: n['posted']):
+            self.comments_by_item_id.setdefault(comment['item_id'], []).append(comment)
+        self.items = [
+            self._convert_to_item(raw) for raw in state['items']
+            if raw['checked'] == 0
+            and raw['parent_id'] is None
+        ]
+        self.synced_at = time.monotonic()
 
-    @property
-    def _section_name_by_id(self):
-        return {p['id']: p['name'] for p in self.client.state['sections']}
+    def invalidate(self):
+        self.synced_at = None
 
     def _convert_to_item(self, raw):
         title = raw['content']
-        created_time = datetime.fromisoformat(raw["date_added"][:-1])
 
-        tags = [self._label_name_by_id[label_id] for label_id in raw['labels']]
+        tags = [self.label_name_by_id[label_id] for label_id in raw['labels']]
 
         jira_codes = re.findall(r"[A-Z]+-[0-9]+", raw['content'])
         tags.extend(jira_codes)
 
         if raw['section_id'] is not None:
-            tags.append(self._section_name_by_id[raw['section_id']])
+            tags.append(self.section_name_by_id[raw['section_id']])
 
         return ContextProviderItem(
             title=title,
             uid=raw["id"],
-            collection=self._project_name_by_id[raw["project_id"]],
+            collection=self.project_name_by_id[raw["project_id"]],
             account=self.client.state["user"]["email"],
             service="todoist",
             tags=tags,
             created_time=datetime.fromisoformat(raw["date_added"][:-1]),
+            comments=[c['content'] for c in self.comments_by_item_id.get(raw["id"], [])],
             raw=raw,
         )
 
     @property
     def all_items(self):
-        self.client.sync()
-        return [
-            self._convert_to_item(raw) for raw in self.client.state['items']
-            if raw['checked'] == 0
-            and raw['parent_id'] is None
-        ] 
+        with self.lock:
+            if self.synced_at is None or time.monotonic() - self.synced_at > self.sync_interval:
+                self._sync()
+            return self.items
 
     def get_items(self, filters: Dict[str, Any]):
         items = self.all_items
@@ -82,5 +106,4 @@ class ContextProviderTodoist(ContextProvider):
         return items
 
     def get_comments(self, task):
-        return [n for n in self.client.state['notes'] if n['item_id'] == task.uid]
-
+        return self.comments_by_item_id.get(task.uid, [])
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import threading
+from collections import deque
+from typing import Dict, List, Set, Tuple
+
+from notebox.note import Note
+from notebox.note_folder import NoteFolder, NoteEvent
+
+
+class LinkGraph:
+    '''Links and references between the notes of a set of folders, in both directions
+
+    Nodes are absolute note paths. The graph is built on the first query, and kept up to date afterwards through the
+    events of the folders. Events which arrive while it is being built are applied once it is.
+    '''
+
+    def __init__(self, folders: List[NoteFolder]):
+        self.folders = folders
+        self.forward: Dict[str, Set[str]] = dict()
+        self.reverse: Dict[str, Set[str]] = dict()
+        self.notes_by_path: Dict[str, Note] = dict()
+        self.lock = threading.RLock()
+        self.built = False
+        self.building = False
+        self.pending: List[Tuple[NoteEvent, Note]] = []
+        # Guards built, building and pending, without waiting for a build holding lock
+        self.pending_lock = threading.Lock()
+        for folder in folders:
+            folder.subscribe(self.on_event)
+
+    @staticmethod
+    def targets(note: Note):
+        return {
+            sys.intern(os.path.normpath(os.path.join(note.directory, link.path)))
+            for link in [*note.body.links, *note.body.references]
+        }
+
+    def build(self):
+        with self.lock:
+            if self.built:
+                return
+            with self.pending_lock:
+                self.building = True
+            for folder in self.folders:
+                for note in folder.notes:
+                    self.update(note)
+            while True:
+                with self.pending_lock:
+                    if len(self.pending) == 0:
+                        self.built = True
+                        self.building = False
+                        return
+                    pending, self.pending = self.pending, []
+                for event, note in pending:
+                    self.apply(event, note)
+
+    def on_event(self, event: NoteEvent, note: Note):
+        with self.pending_lock:
+            if not self.built:
+                if self.building:
+                    self.pending.append((event, note))
+                return
+        self.apply(event, note)
+
+    def apply(self, event: NoteEvent, note: Note):
+        if event == NoteEvent.REMOVED:
+            self.remove(note)
+        else:
+            self.update(note)
+
+    def update(self, note: Note):
+        path = note.filepath
+        targets = self.targets(note)
+        with self.lock:
+            previous = self.forward.get(path, set())
+            for target in previous - targets:
+                self.reverse[target].discard(path)
+            for target in targets - previous:
+                self.reverse.setdefault(target, set()).add(path)
+            self.forward[path] = targets
+            self.notes_by_path[path] = note
+
+    def remove(self, note: Note):
+        path = note.filepath
+        with self.lock:
+            for target in self.forward.pop(path, set()):
+                self.reverse[target].discard(path)
+            self.notes_by_path.pop(path, None)
+
+    def links(self, note: Note) -> List[Note]:
+        '''Notes which note links to
+        '''
+        self.build()
+        with self.lock:
+            return self._notes(self.forward.get(note.filepath, set()))
+
+    def backlinks(self, note: Note) -> List[Note]:
+        '''Notes which link to note
+        '''
+        self.build()
+        with self.lock:
+            return self._notes(self.reverse.get(note.filepath, set()))
+
+    def neighbours(self, note: Note, hops: int = 2) -> List[Tuple[Note, int]]:
+        '''Notes within a number of hops of note, following links in either direction, with their distance
+        '''
+        self.build()
+        start = note.filepath
+        distances = {start: 0}
+        queue = deque([start])
+        with self.lock:
+            while len(queue) > 0:
+                path = queue.popleft()
+                if distances[path] == hops:
+                    continue
+                for neighbour in self.forward.get(path, set()) | self.reverse.get(path, set()):
+                    if neighbour not in distances:
+                        distances[neighbour] = distances[path] + 1
+                        queue.append(neighbour)
+            return [
+                (self.notes_by_path[path], distance)
+                for path, distance in sorted(distances.items(), key=lambda i: i[1])
+                if path != start and path in self.notes_by_path
+            ]
+
+    def _notes(self, paths: Set[str]):
+        return [self.notes_by_path[p] for p in sorted(paths) if p in self.notes_by_path]
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import heapq
+import threading
+from typing import Dict, List, Set
+
+from notebox.note import Note
+from notebox.note_folder import NoteFolder, NoteEvent
+from notebox.stats import timed
+
+
+def trigrams(text: str):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TitleMatcher:
+    '''Finds and ranks the notes of a folder of which the title contains every word of a query
+
+    Lowercased titles and a trigram index of them are kept up to date through the events of the folder. Matches are
+    ranked with flagged notes first, then on how well the words match, and then on how recently the note changed.
+    '''
+
+    def __init__(self, folder: NoteFolder):
+        self.folder = folder
+        self.lock = threading.RLock()
+        self.notes: Dict[str, Note] = dict()
+        self.titles: Dict[str, str] = dict()
+        self.trigrams: Dict[str, Set[str]] = dict()
+        self._last_query = None
+        self._last_matches = None
+        with folder.lock:
+            for note in folder.notes:
+                self.add(note)
+            folder.subscribe(self.on_event)
+
+    def on_event(self, event: NoteEvent, note: Note):
+        if event == NoteEvent.REMOVED:
+            self.remove(note.uid)
+        else:
+            self.add(note)
+
+    def add(self, note: Note):
+        title = str(note.body.title).lower()
+        with self.lock:
+            if self.titles.get(note.uid) == title and self.notes.get(note.uid) is note:
+                return
+            self.remove(note.uid)
+            self.notes[note.uid] = note
+            self.titles[note.uid] = title
+            for trigram in trigrams(title):
+                self.trigrams.setdefault(trigram, set()).add(note.uid)
+            self._last_query = None
+
+    def remove(self, uid: str):
+        with self.lock:
+            title = self.titles.pop(uid, None)
+            if title is None:
+                return
+            del self.notes[uid]
+            for trigram in trigrams(title):
+                uids = self.trigrams[trigram]
+                uids.discard(uid)
+                if len(uids) == 0:
+                    del self.trigrams[trigram]
+            self._last_query = None
+
+    def _candidates(self, query: str, words: List[str]):
+        if self._last_query is not None and query.startswith(self._last_query):
+            # An extended query can only match a subset of what the previous one matched
+            candidates = self._last_matches
+        else:
+            candidates = None
+        for word in words:
+            for trigram in trigrams(word):
+                uids = self.trigrams.get(trigram, set())
+                candidates = set(uids) if candidates is None else candidates & uids
+        return candidates if candidates is not None else set(self.titles.keys())
+
+    def _score(self, title: str, words: List[str]):
+        score = 0
+        for word in words:
+            if title.startswith(word):
+                score += 3
+            elif f" {word}" in title:
+                score += 2
+            else:
+                score += 1
+        return score
+
+    @timed("TitleMatcher.match")
+    def match(self, query: str, limit: int = 50) -> List[Note]:
+        words = [w for w in query.lower().split(' ') if w != '']
+        with self.lock:
+            matches = {
+                uid for uid in self._candidates(query, words)
+                if all(w in self.titles[uid] for w in words)
+            }
+            self._last_query = query
+            self._last_matches = matches
+            ranked = heapq.nsmallest(limit, matches, key=lambda uid: (
+                not self.notes[uid].flagged,
+                -self._score(self.titles[uid], words),
+                -self.folder.mtime_ns(uid),
+                self.titles[uid],
+            ))
+            return [self.notes[uid] for uid in ranked]
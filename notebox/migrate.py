@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+import os
+from dataclasses import dataclass
+from typing import Dict, List
+
+from notebox.note import Note, Link
+from notebox.note_folder import NoteFolder
+from notebox.link_graph import LinkGraph
+
+
+@dataclass
+class MigrationResult:
+    moved: int = 0
+    rewritten: int = 0
+
+
+def rewrite_links(note: Note, old_directory: str, moved_paths: Dict[str, str]):
+    '''Point the relative links of note, which used to be in old_directory, at where their targets are now
+    '''
+    changed = False
+    for links in [note.body.links, note.body.references]:
+        for n, link in enumerate(links):
+            old_target = os.path.normpath(os.path.join(old_directory, link.path))
+            new_target = moved_paths.get(old_target, old_target)
+            if new_target == old_target and note.directory == old_directory:
+                continue
+            path = os.path.relpath(new_target, note.directory)
+            if path != link.path:
+                links[n] = Link(link.title, path)
+                changed = True
+    return changed
+
+
+def migrate_layout(folders: List[NoteFolder], link_graph: LinkGraph):
+    '''Move the files of all notes to where the layout of their folder wants them, and repair the links to and from them
+
+    The notes linking to moved notes are found through the reverse index of the link graph, and every affected note is
+    written once.
+    '''
+    link_graph.build()
+    moves = [
+        (folder, note, folder.layout.subdir(note.uid))
+        for folder in folders
+        for note in folder.notes
+        if note.subdir != folder.layout.subdir(note.uid)
+    ]
+    result = MigrationResult()
+    if len(moves) == 0:
+        return result
+
+    # Directory every affected note was in, by the note, before anything moves
+    old_directories: Dict[int, str] = dict()
+    affected: Dict[int, Note] = dict()
+    with link_graph.lock:
+        for _, note, _ in moves:
+            for n in [note, *link_graph._notes(link_graph.reverse.get(note.filepath, set()))]:
+                old_directories[id(n)] = n.directory
+                affected[id(n)] = n
+
+    moved_paths: Dict[str, str] = dict()
+    emptied = set()
+    for folder, note, subdir in moves:
+        old_path = note.filepath
+        folder.move(note, subdir)
+        moved_paths[old_path] = note.filepath
+        if old_directories[id(note)] != folder.path:
+            emptied.add(old_directories[id(note)])
+        result.moved += 1
+
+    folders_by_path = {folder.path: folder for folder in folders}
+    for key, note in affected.items():
+        folder = folders_by_path[note.folder_path]
+        with folder.lock:
+            if not rewrite_links(note, old_directories[key], moved_paths):
+                continue
+            folder.push_note(note)
+            folder.update(note)
+        result.rewritten += 1
+
+    # Shards left empty are removed, deepest first
+    for directory in sorted(emptied, key=len, reverse=True):
+        for path in [directory, os.path.dirname(directory)]:
+            try:
+                os.rmdir(path)
+            except OSError:
+                pass
+    return result
@@ -1,23 +1,46 @@
 #!/usr/bin/env python3
 
 import os
+import sys
+import copy
 import shutil
 import re
-import io
+import stat
+import hashlib
+import tempfile
+import functools
 from enum import Enum
 from dataclasses import dataclass, field
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable
 
 import yaml
 
 from notebox.context_provider.base import ContextProviderItem
+from notebox.stats import stats, timed
 
 
 LINKS_HEADER = "**Links**"
 REFERENCES_HEADER = "**References**"
+FRONT_MATTER_DELIMITER = "---"
+LINK_PATTERN = re.compile(r"\[(.+)\]\((.+)\)")
 
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+YAML_DUMPER = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+YAML_RESOLVER = yaml.resolver.Resolver()
+YAML_STR_TAG = 'tag:yaml.org,2002:str'
+YAML_WIDTH = 80
+# Strings YAML emits unquoted: starting with a word character, without indicators like '#', quotes or a trailing ':'
+PLAIN_YAML_STRING_PATTERN = re.compile(r"[^\W_](?:[\w \-.,()'/:+=?!&%@~$;]*[\w.)'/+=?!&%@~$;-])?\Z")
 
-@dataclass(eq=True, frozen=True)
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+class MalformedNoteException(Exception):
+    pass
+
+
+@dataclass(eq=True, frozen=True, slots=True)
 class Link:
     title: str
     path: str
@@ -31,7 +54,7 @@ class NoteType(Enum):
     DAILY = "daily"
 
 
-@dataclass
+@dataclass(slots=True)
 class NoteBody:
 
     # Front matter
@@ -47,45 +70,41 @@ class NoteBody:
 
     @classmethod
     def from_string(cls, raw_content):
-        blocks = raw_content.split('---')
-
         # Front matter
-        if blocks[0] != '':
-            raise MalformedNoteException(filepath)
-        front_matter_raw = yaml.load(blocks[1], Loader=yaml.FullLoader)
-        title = front_matter_raw['title']
-        extra_attributes = {k: v for k, v in front_matter_raw.items() if k != 'title'}
+        front_matter_start = raw_content.find('\n') + 1
+        if front_matter_start == 0 or raw_content[:front_matter_start].strip() != FRONT_MATTER_DELIMITER:
+            raise MalformedNoteException("Note does not start with front matter")
+        front_matter_end = _find_delimiter(raw_content, front_matter_start - 1, len(raw_content))
+        if front_matter_end < 0:
+            raise MalformedNoteException("Note has unterminated front matter")
+        title, extra_attributes = cls.parse_front_matter(raw_content[front_matter_start:front_matter_end])
+        content_start = raw_content.find('\n', front_matter_end + 1)
+        content_start = len(raw_content) if content_start < 0 else content_start
 
-        # Footer
-        link_pattern = re.compile(r"\[(.+)\]\((.+)\)")
+        # Footer, which is the block after the last delimiter, if that starts with a footer header
         links = []
         references = []
-        has_footer = True
-        in_links = False
-        in_references = False
-        for n, line in enumerate([l for l in blocks[-1].strip().split('\n') if l != '']):
-            line = line.strip()
-            if n == 0 and line != LINKS_HEADER and line != REFERENCES_HEADER:
-                has_footer = False
-                break
-            elif line== LINKS_HEADER:
-                in_links = True
-                in_references = False
-            elif line == REFERENCES_HEADER:
+        content_end = len(raw_content)
+        footer_start = _find_delimiter(raw_content, content_start, len(raw_content), reverse=True)
+        if footer_start >= 0:
+            footer_lines = [l.strip() for l in raw_content[footer_start:].split('\n')[1:]]
+            footer_lines = [l for l in footer_lines if l != '']
+            if len(footer_lines) > 0 and footer_lines[0] in (LINKS_HEADER, REFERENCES_HEADER):
+                content_end = footer_start
                 in_links = False
-                in_references = True
-            else:
-                m = link_pattern.search(line)
-                if not m:
-                    continue
-                link = Link(m.groups()[0], m.groups()[1])
-                if in_links:
-                    links.append(link)
-                elif in_references:
-                    references.append(link)
+                for line in footer_lines:
+                    if line == LINKS_HEADER:
+                        in_links = True
+                    elif line == REFERENCES_HEADER:
+                        in_links = False
+                    else:
+                        m = LINK_PATTERN.search(line)
+                        if m:
+                            # Many notes link to the same notes, so their paths are shared
+                            (links if in_links else references).append(Link(m.group(1), sys.intern(m.group(2))))
 
         # Content
-        content = "---".join(blocks[2:-1] if has_footer else blocks[2:]).strip()
+        content = raw_content[content_start:content_end].strip()
 
         return cls(
             title=title,
@@ -95,34 +114,276 @@ class NoteBody:
             references=references
         )
 
-    def to_string(self):
-        stream = io.StringIO()
-        yaml.dump(dict(title=self.title), stream, allow_unicode=True)
+    @classmethod
+    def from_file(cls, filepath):
+        with open(filepath) as f:
+            return cls.from_string(f.read())
+
+    @staticmethod
+    def parse_front_matter(raw_front_matter):
+        front_matter_raw = _load_simple_yaml(raw_front_matter)
+        if front_matter_raw is None:
+            try:
+                front_matter_raw = yaml.load(raw_front_matter, Loader=YAML_LOADER)
+            except yaml.constructor.ConstructorError:
+                # Python specific tags, which the previous full loader accepted
+                front_matter_raw = yaml.load(raw_front_matter, Loader=yaml.FullLoader)
+        title = front_matter_raw['title']
+        extra_attributes = {k: v for k, v in front_matter_raw.items() if k != 'title'}
+        return title, extra_attributes
+
+    @classmethod
+    def read_front_matter(cls, filepath):
+        '''Read and parse only the front matter of a note file, stopping at its closing delimiter
+        '''
+        lines = []
+        with open(filepath) as f:
+            if f.readline().strip() != FRONT_MATTER_DELIMITER:
+                raise MalformedNoteException(f"{filepath} does not start with front matter")
+            for line in f:
+                if line.strip() == FRONT_MATTER_DELIMITER:
+                    break
+                lines.append(line)
+            else:
+                raise MalformedNoteException(f"{filepath} has unterminated front matter")
+        return cls.parse_front_matter("".join(lines))
+
+    def front_matter_to_string(self):
+        parts = [_dump_yaml(dict(title=self.title))]
         if self.extra_attributes != dict():
-            yaml.dump(self.extra_attributes, stream, allow_unicode=True)
-        stream.seek(0)
+            parts.append(_dump_yaml(self.extra_attributes))
+        return "\n".join(parts)
+
+    def to_string(self):
         lines = [
-            f"---",
-            stream.read().strip(),
-            f"---",
-            f"",
+            FRONT_MATTER_DELIMITER,
+            self.front_matter_to_string(),
+            FRONT_MATTER_DELIMITER,
+            "",
             self.content,
         ]
-        stream.close()
         if len(self.links) > 0 or len(self.references) > 0:
-            lines.append(f"\n---")
+            lines.append(f"\n{FRONT_MATTER_DELIMITER}")
         if len(self.links) > 0:
             lines.append(f"\n{LINKS_HEADER}\n")
-            for link in self.links:
-                lines.append(f"- [{link.title}]({link.path})")
+            lines.extend([f"- [{link.title}]({link.path})" for link in self.links])
         if len(self.references) > 0:
             lines.append(f"\n{REFERENCES_HEADER}\n")
-            for link in self.references:
-                lines.append(f"- [{link.title}]({link.path})")
+            lines.extend([f"- [{link.title}]({link.path})" for link in self.references])
         return "\n".join(lines)
 
 
-@dataclass
+def _find_delimiter(raw_content, start, end, reverse=False):
+    '''Position of the first (or last) line between start and end which is a delimiter, or -1
+
+    start should point at a newline or the start of the string, positions returned point after the newline.
+    '''
+    find = raw_content.rfind if reverse else raw_content.find
+    needle = '\n' + FRONT_MATTER_DELIMITER
+    while True:
+        pos = find(needle, start, end)
+        if pos < 0:
+            return -1
+        line_end = raw_content.find('\n', pos + 1)
+        line = raw_content[pos + 1:line_end if line_end >= 0 else len(raw_content)]
+        if line.strip() == FRONT_MATTER_DELIMITER:
+            return pos + 1
+        if reverse:
+            end = pos
+        else:
+            start = pos + 1
+
+
+def _is_plain_yaml_string(value):
+    '''Whether value is a string which YAML reads and writes as-is, without quoting or type conversion
+    '''
+    return (
+        isinstance(value, str)
+        and PLAIN_YAML_STRING_PATTERN.match(value) is not None
+        and ': ' not in value
+        and YAML_RESOLVER.resolve(yaml.ScalarNode, value, (True, False)) == YAML_STR_TAG
+    )
+
+
+def _load_simple_yaml(raw):
+    '''Parse a mapping of plain strings without the YAML parser, returning None when it is not that simple
+    '''
+    d = dict()
+    for line in raw.strip('\n').split('\n'):
+        key, sep, value = line.partition(': ')
+        if sep == '' or not _is_plain_yaml_string(key) or not _is_plain_yaml_string(value):
+            return None
+        d[key] = value
+    return d
+
+
+def _dump_yaml(d):
+    '''Dump a mapping the way yaml.dump does, writing mappings of short plain strings directly
+    '''
+    if all(
+        _is_plain_yaml_string(k) and _is_plain_yaml_string(v) and len(k) + len(v) + 2 <= YAML_WIDTH
+        for k, v in d.items()
+    ):
+        return "\n".join(f"{k}: {d[k]}" for k in sorted(d))
+    try:
+        return yaml.dump(d, Dumper=YAML_DUMPER, allow_unicode=True).strip()
+    except yaml.representer.RepresenterError:
+        # Python specific types, which the previous full dumper accepted
+        return yaml.dump(d, allow_unicode=True).strip()
+
+
+IMMUTABLE_TYPES = (str, int, float, bool, type(None))
+
+
+class LazyNoteBody:
+    '''Stand-in for NoteBody of which only some parts are known up front
+
+    The parts which are not known are read from the note file the first time they are accessed.
+    '''
+
+    __slots__ = ('_reader', 'title', 'extra_attributes', '_content', '_links', '_references', '_pristine', 'source_digest')
+
+    def __init__(self, reader: Callable[[], str], title: str, extra_attributes: Dict[str, Any] = None,
+                 links: List[Link] = None, references: List[Link] = None):
+        self._reader = reader
+        self.title = title
+        self.extra_attributes = extra_attributes if extra_attributes is not None else dict()
+        self._content = None
+        self._links = links
+        self._references = references
+        title, attributes, links, references = self._front_matter_and_footer()
+        # Nested values, like a list of comments, can be changed in place, so those are copied
+        if not all(isinstance(value, IMMUTABLE_TYPES) for _, value in attributes):
+            attributes = copy.deepcopy(attributes)
+        self._pristine = (title, attributes, links, references)
+        self.source_digest = None
+
+    @property
+    def is_loaded(self):
+        return self._content is not None
+
+    @property
+    def is_pristine(self):
+        '''Whether nothing was read or changed since the body was created, so it still matches the note file
+        '''
+        return not self.is_loaded and self._front_matter_and_footer() == self._pristine
+
+    def _front_matter_and_footer(self):
+        return (
+            self.title,
+            # A tuple, which is shared when there are no extra attributes
+            tuple(self.extra_attributes.items()),
+            list(self._links) if self._links is not None else None,
+            list(self._references) if self._references is not None else None,
+        )
+
+    def load(self):
+        raw_content = self._reader()
+        body = NoteBody.from_string(raw_content)
+        self.source_digest = body_digest(body)
+        self._content = body.content
+        if self._links is None:
+            self._links = body.links
+        if self._references is None:
+            self._references = body.references
+        self._reader = None
+
+    @property
+    def content(self):
+        if self._content is None:
+            self.load()
+        return self._content
+
+    @content.setter
+    def content(self, value):
+        if self._content is None:
+            self.load()
+        self._content = value
+
+    @property
+    def links(self):
+        if self._links is None:
+            self.load()
+        return self._links
+
+    @links.setter
+    def links(self, value):
+        self._links = value
+
+    @property
+    def references(self):
+        if self._references is None:
+            self.load()
+        return self._references
+
+    @references.setter
+    def references(self, value):
+        self._references = value
+
+    def to_body(self):
+        return NoteBody(
+            title=self.title,
+            extra_attributes=self.extra_attributes,
+            content=self.content,
+            links=self.links,
+            references=self.references
+        )
+
+    def to_string(self):
+        return self.to_body().to_string()
+
+    def __eq__(self, other):
+        if isinstance(other, (NoteBody, LazyNoteBody)):
+            return self.to_body() == (other.to_body() if isinstance(other, LazyNoteBody) else other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"LazyNoteBody(title={self.title!r}, loaded={self.is_loaded})"
+
+
+def read_file(filepath):
+    with open(filepath) as f:
+        return f.read()
+
+
+def write_file_atomic(filepath, raw_content):
+    '''Write to a temporary file next to filepath and move it in place, so a note file is never seen half written
+    '''
+    fd, tmp_filepath = tempfile.mkstemp(dir=os.path.dirname(filepath), prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(raw_content)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            mode = stat.S_IMODE(os.stat(filepath).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~UMASK
+        os.chmod(tmp_filepath, mode)
+        os.replace(tmp_filepath, filepath)
+    except BaseException:
+        if os.path.exists(tmp_filepath):
+            os.remove(tmp_filepath)
+        raise
+
+
+def content_digest(raw_content):
+    return hashlib.blake2b(raw_content.encode(), digest_size=16).digest()
+
+
+def body_digest(body: NoteBody):
+    '''Digest of a body as push would write it, so a file which isn't in that form doesn't count as changed
+    '''
+    return content_digest(body.to_string())
+
+
+def subdir_of(directory: str, folder_path: str):
+    '''Path of directory relative to folder_path, shared between all notes in it
+    '''
+    return "" if directory == folder_path else sys.intern(os.path.relpath(directory, folder_path))
+
+
+@dataclass(slots=True)
 class Note:
     uid: str
     folder_path: str
@@ -131,35 +392,78 @@ class Note:
     provider_item: ContextProviderItem = None
     domain: str = None
     flagged: bool = False
+    digest: bytes = field(default=None, compare=False, repr=False)
+    # Folder within folder_path holding the file, which is empty unless the folder is sharded
+    subdir: str = field(default="", compare=False, repr=False)
 
     @property
     def filepath(self):
-        return os.path.join(self.folder_path, self.uid + ".md")
+        return os.path.join(self.folder_path, self.subdir, self.uid + ".md")
+
+    @property
+    def directory(self):
+        '''Folder holding the file, which relative link paths start from
+        '''
+        return os.path.join(self.folder_path, self.subdir) if self.subdir else self.folder_path
 
     @property
     def is_empty(self):
         return len(self.body.content) == 0 and len(self.body.links) == 0 and len(self.body.references) == 0
 
     @classmethod
-    def load(cls, filepath, note_type, domain):
-        with open(filepath) as f:
-            raw_content = f.read()
+    @timed("Note.load")
+    def load(cls, filepath, note_type, domain, lazy: bool = False, folder_path: str = None):
+        '''Load a note from file. A lazy note only reads the front matter, the rest is read when first accessed
+
+        The file can be in a subfolder of folder_path, which defaults to the folder of the file.
+        '''
+        digest = None
+        if lazy:
+            title, extra_attributes = NoteBody.read_front_matter(filepath)
+            body = LazyNoteBody(functools.partial(read_file, filepath), title, extra_attributes)
+        else:
+            raw_content = read_file(filepath)
+            body = NoteBody.from_string(raw_content)
+            digest = body_digest(body)
+        directory = os.path.abspath(os.path.dirname(filepath))
+        folder_path = sys.intern(directory) if folder_path is None else folder_path
         return cls(
             uid=os.path.split(os.path.splitext(filepath)[0])[-1],
-            folder_path=os.path.abspath(os.path.dirname(filepath)),
+            folder_path=folder_path,
             note_type=note_type,
             domain=domain,
-            body=NoteBody.from_string(raw_content)
+            body=body,
+            digest=digest,
+            subdir=subdir_of(directory, folder_path),
         )
 
     def pull(self):
-        with open(self.filepath) as f:
-            raw_content = f.read()
+        raw_content = read_file(self.filepath)
         self.body = NoteBody.from_string(raw_content)
+        self.digest = body_digest(self.body)
+
+    @property
+    def _known_digest(self):
+        if self.digest is None and isinstance(self.body, LazyNoteBody):
+            return self.body.source_digest
+        return self.digest
 
+    @timed("Note.push")
     def push(self):
-        with open(self.filepath, 'w') as f:
-            f.write(self.body.to_string())
+        '''Write the note to file, unless it is unchanged since it was last read or written
+
+        Returns whether the file was written.
+        '''
+        if isinstance(self.body, LazyNoteBody) and self.body.is_pristine:
+            return False
+        raw_content = self.body.to_string()
+        digest = content_digest(raw_content)
+        if digest == self._known_digest:
+            return False
+        write_file_atomic(self.filepath, raw_content)
+        self.digest = digest
+        stats.count("Note.push.written")
+        return True
 
     def delete(self):
         os.remove(self.filepath)
@@ -1,53 +1,248 @@
 #!/usr/bin/env python3
 
 import os
+import re
+import functools
+import threading
+from enum import Enum
 from datetime import datetime
+from typing import Any, Callable, Dict, List
 
-from notebox.note import Note, NoteBody, NoteType
+from notebox.note import Note, NoteBody, LazyNoteBody, NoteType, MalformedNoteException, read_file, subdir_of
+from notebox.note_index import NoteIndex, NoteIndexEntry
+from notebox.stats import timed
 
 
-class MalformedNoteException(Exception):
-    pass
+def fingerprint(stat: os.stat_result):
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+class NoteEvent(Enum):
+    ADDED = "added"
+    CHANGED = "changed"
+    # A change which includes the title
+    RENAMED = "renamed"
+    REMOVED = "removed"
+
+
+SHARD_PATTERN = re.compile(r"(\d{4})-?(\d{2})")
+
+
+class NoteLayout(Enum):
+    '''Where a folder puts the files of its notes
+    '''
+    FLAT = "flat"
+    # Notes of which the UID starts with a date go into a folder per year and month, like 2026/10/<uid>.md
+    SHARDED = "sharded"
+
+    def subdir(self, uid: str):
+        if self == NoteLayout.SHARDED:
+            match = SHARD_PATTERN.match(uid)
+            if match:
+                return os.path.join(match.group(1), match.group(2))
+        return ""
+
+
+# Notes are found this many numbered folders deep, whatever the layout, so a folder can be read halfway a migration
+SHARD_DEPTH = 2
+
+
+def is_shard(entry: os.DirEntry):
+    return entry.name.isdigit() and entry.is_dir()
 
 
 class NoteFolder:
     '''Manages a folder of notes, and conversions between files and Note objects
+
+    A deferred folder is only read the first time its notes are asked for.
     '''
 
-    def __init__(self, path: str, note_type: NoteType, domain: str = None):
+    def __init__(self, path: str, note_type: NoteType, domain: str = None, index: NoteIndex = None, lazy: bool = False, defer: bool = False, layout: NoteLayout = NoteLayout.FLAT):
         self.path = os.path.abspath(path)
-        self.notes = []
+        self.layout = layout
         self.note_type = note_type
         self.domain = domain
+        self.index = index
+        self.lazy = lazy
+        self._stat_cache = dict()
+        self._notes_by_id = dict()
+        self._notes_by_title = dict()
+        self._indexed_titles = dict()
+        self._subscribers = []
+        self.lock = threading.RLock()
+        self.watched = False
+        self.loaded = False
 
-        self.pull()
+        if not defer:
+            self.pull()
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            self.pull()
+
+    @property
+    def notes(self):
+        with self.lock:
+            self.ensure_loaded()
+            return list(self._notes_by_id.values())
 
     @property
     def notes_by_id(self):
-        return {n.uid: n for n in self.notes}
+        self.ensure_loaded()
+        return self._notes_by_id
 
     @property
     def notes_by_title(self):
-        return {n.body.title: n for n in self.notes}
+        '''Notes by title, as a list per title since titles don't have to be unique
+        '''
+        self.ensure_loaded()
+        return self._notes_by_title
 
     @property
     def titles(self):
-        return [n.body.title for n in self.notes]
+        with self.lock:
+            self.ensure_loaded()
+            return list(self._notes_by_title.keys())
 
     @property
     def uids(self):
-        return [n.uid for n in self.notes]
+        with self.lock:
+            self.ensure_loaded()
+            return list(self._notes_by_id.keys())
+
+    def mtime_ns(self, uid: str):
+        '''Modification time of a note file as of the last time it was read or written, or 0 when unknown
+        '''
+        return self._stat_cache.get(uid, (0,))[0]
+
+    def restore(self, notes: List[Note], fingerprints: Dict[str, tuple]):
+        '''Add notes as they were read earlier along with the fingerprints of their files, which the next pull checks
+        '''
+        with self.lock:
+            if self.loaded:
+                return
+            for note in notes:
+                self._add(note)
+            self._stat_cache.update(fingerprints)
+
+    def indexed_notes(self) -> List[Note]:
+        '''Notes as the persistent index knows them, without reading the folder, or none without an index
+
+        The notes are not added to the folder, and only those of which the file is still there are returned.
+        '''
+        if self.index is None:
+            return []
+        notes = []
+        for uid, index_entry in self.index.get_folder(self.path).items():
+            path = self.note_path(uid)
+            if os.path.exists(path):
+                notes.append(self._note_from_index_entry(index_entry, path))
+        return notes
+
+    def current_note(self, uid: str, stat: os.stat_result):
+        '''The note in memory for uid if its file is unchanged since it was last read or written, without loading
+        '''
+        if self._stat_cache.get(uid) == fingerprint(stat):
+            return self._notes_by_id.get(uid)
+        return None
+
+    def notes_with_title(self, title: str):
+        with self.lock:
+            self.ensure_loaded()
+            return list(self._notes_by_title.get(title, []))
+
+    def set_title(self, note: Note, title: str):
+        with self.lock:
+            note.body.title = title
+            self.update(note)
+
+    def own_note(self, note: Note):
+        '''The note of the folder with the uid of note, which can be another object, like one built from the index
+        '''
+        return self.notes_by_id.get(note.uid)
+
+    def update(self, note: Note):
+        '''Let the indexes and subscribers of the folder know a note was changed in memory
+        '''
+        with self.lock:
+            if self._notes_by_id.get(note.uid) is not note:
+                raise ValueError(f"{note.filepath} is not a note of {self.path}")
+            if self._indexed_titles.get(note.uid) != note.body.title:
+                self._unindex_title(note)
+                self._index_title(note)
+                self._emit(NoteEvent.RENAMED, note)
+            else:
+                self._emit(NoteEvent.CHANGED, note)
+
+    def subscribe(self, callback: Callable[[NoteEvent, Note], None]):
+        '''Call callback for every note which is added, changed or removed. It is called while holding the folder lock
+        '''
+        self._subscribers.append(callback)
+
+    def _emit(self, event: NoteEvent, note: Note):
+        for callback in self._subscribers:
+            callback(event, note)
+
+    def _index_title(self, note: Note):
+        self._indexed_titles[note.uid] = note.body.title
+        self._notes_by_title.setdefault(note.body.title, []).append(note)
+
+    def _unindex_title(self, note: Note):
+        title = self._indexed_titles.pop(note.uid, None)
+        notes = self._notes_by_title.get(title)
+        if notes is None:
+            return
+        notes[:] = [n for n in notes if n is not note]
+        if len(notes) == 0:
+            del self._notes_by_title[title]
+
+    def _add(self, note: Note):
+        self._notes_by_id[note.uid] = note
+        self._index_title(note)
+        self._emit(NoteEvent.ADDED, note)
+
+    def _remove(self, uid: str):
+        note = self._notes_by_id.pop(uid, None)
+        if note is not None:
+            self._unindex_title(note)
+            self._emit(NoteEvent.REMOVED, note)
 
     def create_path_if_not_exists(self):
         os.makedirs(self.path, exist_ok=True)
 
+    def note_path(self, uid: str):
+        '''Path of the file of a note according to the layout
+        '''
+        return os.path.join(self.path, self.layout.subdir(uid), uid + ".md")
+
+    def scan(self, path: str = None, depth: int = SHARD_DEPTH):
+        '''Entries of all note files in path, which defaults to the folder, and its shards
+        '''
+        with os.scandir(self.path if path is None else path) as entries:
+            for entry in entries:
+                if entry.name.endswith(".md"):
+                    yield entry
+                elif depth > 0 and is_shard(entry):
+                    yield from self.scan(entry.path, depth - 1)
+
+    def shards(self, path: str = None, depth: int = SHARD_DEPTH):
+        '''Paths of all shard folders in path, which defaults to the folder
+        '''
+        if depth == 0:
+            return
+        with os.scandir(self.path if path is None else path) as entries:
+            for entry in entries:
+                if is_shard(entry):
+                    yield entry.path
+                    yield from self.shards(entry.path, depth - 1)
+
     def generate_uid(self):
         new_uid = datetime.now().strftime('%Y%m%d%H%M%S')
-        if new_uid in self.uids:
+        if new_uid in self.notes_by_id:
             raise ValueError("UID already exists")
         return new_uid
 
-    def create(self, title: str, custom_uid: str = None):
+    def create(self, title: str, custom_uid: str = None, extra_attributes: Dict[str, Any] = None):
         uid = self.generate_uid() if custom_uid is None else custom_uid
         note = Note(
             uid=uid,
@@ -55,27 +250,167 @@ class NoteFolder:
             note_type=self.note_type,
             body=NoteBody(
                 title=title,
+                extra_attributes=extra_attributes if extra_attributes is not None else dict(),
             ),
             domain=self.domain,
+            subdir=self.layout.subdir(uid),
         )
-        note.push()
-        self.notes.append(note)
+        with self.lock:
+            self.ensure_loaded()
+            os.makedirs(note.directory, exist_ok=True)
+            note.push()
+            self._add(note)
+            self._stat_cache[uid] = fingerprint(os.stat(note.filepath))
         return note
 
+    @timed("NoteFolder.pull")
     def pull(self):
-        '''Read all available notes in path and store in notes list
+        '''Bring the notes list up to date with the files in path
+
+        Only files which are new, or of which the mtime, size or inode changed since the last pull are read. Notes of
+        unchanged files are kept as they are, and changed files are reloaded into their existing Note object.
+        '''
+        with self.lock:
+            self.create_path_if_not_exists()
+            # The persistent index only matters for notes which aren't in memory yet
+            indexed = self.index.get_folder(self.path) if self.index is not None and not self._stat_cache else dict()
+            stat_cache = dict()
+            changed = []
+            for entry in self.scan():
+                uid = entry.name[:-3]
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                note = self._notes_by_id.get(uid)
+                if note is not None and self._stat_cache.get(uid) == fingerprint(stat) and note.filepath == entry.path:
+                    stat_cache[uid] = fingerprint(stat)
+                    continue
+                index_entry = indexed.pop(uid, None)
+                if note is None and index_entry is not None and index_entry.matches(stat):
+                    self._add(self._note_from_index_entry(index_entry, entry.path))
+                    stat_cache[uid] = fingerprint(stat)
+                    continue
+                try:
+                    note, index_entry = self._load(entry.path, stat, note)
+                except FileNotFoundError:
+                    continue
+                stat_cache[uid] = fingerprint(stat)
+                if index_entry is not None:
+                    changed.append(index_entry)
+            if self.index is not None:
+                removed = (indexed.keys() | self._stat_cache.keys()) - stat_cache.keys()
+                self.index.update_folder(self.path, changed, removed)
+            for uid in self._notes_by_id.keys() - stat_cache.keys():
+                self._remove(uid)
+            self._stat_cache = stat_cache
+            self.loaded = True
+
+    def pull_note(self, uid: str, path: str = None):
+        '''Bring a single note up to date with its file, which might mean loading, reloading or dropping it
+
+        path is where the file of the note is, or was, and defaults to where the note is known to be.
+        '''
+        with self.lock:
+            if not self.loaded:
+                # The note is read along with the others when the folder is loaded
+                return
+            note = self._notes_by_id.get(uid)
+            if path is None:
+                path = note.filepath if note is not None else self.note_path(uid)
+            elif note is not None and note.filepath != path and os.path.exists(note.filepath):
+                # Another file of the note, like what's left of a move to or from a shard
+                return
+            try:
+                stat = os.stat(path)
+                if self._stat_cache.get(uid) == fingerprint(stat):
+                    return
+                note, index_entry = self._load(path, stat, self._notes_by_id.get(uid))
+            except FileNotFoundError:
+                self.forget_note(uid)
+                return
+            self._stat_cache[uid] = fingerprint(stat)
+            if index_entry is not None:
+                self.index.update_folder(self.path, [index_entry])
+
+    def forget_note(self, uid: str):
+        '''Drop a note of which the file no longer exists
+        '''
+        with self.lock:
+            self._remove(uid)
+            self._stat_cache.pop(uid, None)
+            if self.index is not None:
+                self.index.update_folder(self.path, [], [uid])
+
+    def _load(self, path: str, stat: os.stat_result, note: Note = None):
+        '''Load the note at path, or reload it into an existing note, and build its index entry if indexing
+        '''
+        loaded = Note.load(path, self.note_type, self.domain, self.lazy and self.index is None, self.path)
+        if note is None:
+            note = loaded
+            self._add(note)
+        else:
+            note.body = loaded.body
+            note.digest = loaded.digest
+            note.subdir = loaded.subdir
+            self.update(note)
+        if self.index is None:
+            return note, None
+        return note, NoteIndexEntry(
+            uid=note.uid,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            title=note.body.title,
+            extra_attributes=note.body.extra_attributes,
+            links=note.body.links,
+            references=note.body.references,
+        )
+
+    def _note_from_index_entry(self, index_entry: NoteIndexEntry, path: str):
+        directory = os.path.dirname(path)
+        return Note(
+            uid=index_entry.uid,
+            folder_path=self.path,
+            note_type=self.note_type,
+            domain=self.domain,
+            subdir=subdir_of(directory, self.path),
+            body=LazyNoteBody(
+                functools.partial(read_file, path),
+                title=index_entry.title,
+                extra_attributes=index_entry.extra_attributes,
+                links=index_entry.links,
+                references=index_entry.references,
+            )
+        )
+
+    def move(self, note: Note, subdir: str):
+        '''Move the file of a note into another shard, letting subscribers know it was removed and added again
+        '''
+        with self.lock:
+            if isinstance(note.body, LazyNoteBody) and not note.body.is_loaded:
+                note.body.load()
+            old_path = note.filepath
+            self._remove(note.uid)
+            note.subdir = subdir
+            os.makedirs(note.directory, exist_ok=True)
+            os.replace(old_path, note.filepath)
+            self._add(note)
+            self._stat_cache[note.uid] = fingerprint(os.stat(note.filepath))
+
+    def push_note(self, note: Note):
+        '''Write a single note if it changed, without it being picked up as changed by the next pull
         '''
-        self.create_path_if_not_exists()
-        self.notes = [
-            Note.load(os.path.join(self.path, fn), self.note_type, self.domain)
-            for fn in os.listdir(self.path)
-            if fn.endswith(".md")
-        ]
+        with self.lock:
+            if note.push():
+                self._stat_cache[note.uid] = fingerprint(os.stat(note.filepath))
 
     def push(self):
         '''Write all notes in notes list to path
         '''
-        self.create_path_if_not_exists()
-        for note in self.notes:
-            note.push()
+        with self.lock:
+            if not self.loaded:
+                return
+            self.create_path_if_not_exists()
+            for note in self.notes:
+                self.push_note(note)
 
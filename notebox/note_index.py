@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import pickle
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Iterable
+
+from notebox.note import Link
+
+
+@dataclass
+class NoteIndexEntry:
+    uid: str
+    size: int
+    mtime_ns: int
+    title: str
+    extra_attributes: Dict[str, Any] = field(default_factory=dict)
+    links: List[Link] = field(default_factory=list)
+    references: List[Link] = field(default_factory=list)
+
+    def matches(self, stat: os.stat_result):
+        return self.size == stat.st_size and self.mtime_ns == stat.st_mtime_ns
+
+
+class NoteIndex:
+    '''Persistent metadata index of all notes in a notebox, stored in a SQLite database
+
+    Entries are keyed by folder and UID, and carry the size and mtime of the file they were read from, so a
+    folder can tell which notes are unchanged since the last run without opening them.
+    '''
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._create_schema()
+
+    def _create_schema(self):
+        with self.lock, self.connection:
+            version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != self.SCHEMA_VERSION:
+                self.connection.execute("DROP TABLE IF EXISTS notes")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS notes ("
+                "folder TEXT NOT NULL, "
+                "uid TEXT NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "mtime_ns INTEGER NOT NULL, "
+                "title TEXT NOT NULL, "
+                "extra_attributes BLOB NOT NULL, "
+                "links BLOB NOT NULL, "
+                "refs BLOB NOT NULL, "
+                "PRIMARY KEY (folder, uid))"
+            )
+            self.connection.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    def get_folder(self, folder_path: str) -> Dict[str, NoteIndexEntry]:
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT uid, size, mtime_ns, title, extra_attributes, links, refs FROM notes WHERE folder = ?",
+                (folder_path,)
+            ).fetchall()
+        return {
+            uid: NoteIndexEntry(
+                uid=uid,
+                size=size,
+                mtime_ns=mtime_ns,
+                title=title,
+                extra_attributes=pickle.loads(extra_attributes),
+                links=[Link(link_title, sys.intern(link_path)) for link_title, link_path in pickle.loads(links)],
+                references=[Link(link_title, sys.intern(link_path)) for link_title, link_path in pickle.loads(refs)],
+            )
+            for uid, size, mtime_ns, title, extra_attributes, links, refs in rows
+        }
+
+    def update_folder(self, folder_path: str, entries: Iterable[NoteIndexEntry], removed_uids: Iterable[str] = ()):
+        rows = [
+            (
+                folder_path,
+                e.uid,
+                e.size,
+                e.mtime_ns,
+                e.title,
+                pickle.dumps(e.extra_attributes),
+                pickle.dumps([(l.title, l.path) for l in e.links]),
+                pickle.dumps([(l.title, l.path) for l in e.references]),
+            )
+            for e in entries
+        ]
+        with self.lock, self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO notes VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.connection.executemany(
+                "DELETE FROM notes WHERE folder = ? AND uid = ?",
+                [(folder_path, uid) for uid in removed_uids]
+            )
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -1,20 +1,32 @@
 #!/usr/bin/env python3
 
 import os
+import threading
 import subprocess
 from dataclasses import dataclass
+from typing import List
 
 from notebox.config import Config, ContextFolderConfig
-from notebox.note_folder import NoteFolder
+from notebox.note_folder import NoteFolder, NoteLayout
 from notebox.note import Note, NoteType, Link
+from notebox.note_index import NoteIndex
 from notebox.context_provider import context_provider_factory
 from notebox.context_provider.daily import ContextProviderDaily
 from notebox.context_folder import ContextFolder
+from notebox.watcher import create_watcher
+from notebox.link_graph import LinkGraph
+from notebox.relink import TitlePropagator
+from notebox.clean import clean_folders
+from notebox.migrate import migrate_layout
+from notebox.snapshot import read_snapshot, restore_folder, write_snapshot
+from notebox.search import SearchIndex
+from notebox.sync import SyncScheduler
 
 
 def refresh(f):
     def wrapper(self, *args, **kwargs):
-        self.zettel.pull()
+        if not self.zettel.watched:
+            self.zettel.pull()
         res = f(self, *args, **kwargs)
         self.zettel.push()
         return res
@@ -22,51 +34,159 @@ def refresh(f):
 
 
 class Notebox:
+    '''Folders of all note types, kept in sync with the context providers
 
-    def __init__(self, config: Config):
+    Providers only connect when they are first synced, and folders are only read when their notes are first asked for.
+    Without sync, the providers are left alone until sync or sync_in_background is called.
+    '''
+
+    def __init__(self, config: Config, sync: bool = True):
         self.path = config.path
         self.editor = config.editor
 
         self.context_providers = {
-            context_provider_config.name: context_provider_factory(context_provider_config)
+            context_provider_config.name: context_provider_factory(context_provider_config, config.cache)
             for context_provider_config in config.context_providers
         }
         self.context_providers['daily'] = ContextProviderDaily()
+        self.provider_timeouts = {
+            context_provider_config.name: context_provider_config.timeout
+            for context_provider_config in config.context_providers
+        }
+
+        self.index = NoteIndex(config.index_path) if config.index_path is not None else None
+        folder_options = dict(index=self.index, lazy=config.lazy_load, defer=True, layout=NoteLayout(config.layout))
+        context_folder_options = dict(folder_options, keep_raw=config.keep_raw)
 
-        self.zettel = NoteFolder(os.path.join(self.path, "zettel"), NoteType.ZETTEL)
-        self.source = ContextFolder(config.source, os.path.join(self.path, "source"), self.context_providers, NoteType.SOURCE)
+        self.zettel = NoteFolder(os.path.join(self.path, "zettel"), NoteType.ZETTEL, **folder_options)
+        self.source = ContextFolder(config.source, os.path.join(self.path, "source"), self.context_providers, NoteType.SOURCE, **context_folder_options)
         # TODO Add dailies
-        self.daily = ContextFolder(ContextFolderConfig('daily', "{title}", dict()), os.path.join(self.path, "daily"), self.context_providers, NoteType.DAILY)
+        self.daily = ContextFolder(ContextFolderConfig('daily', "{title}", dict()), os.path.join(self.path, "daily"), self.context_providers, NoteType.DAILY, **context_folder_options)
 
         self.domains = {
             domain_config.name: dict(
-                event=ContextFolder(domain_config.event, os.path.join(self.path, domain_config.name, "event"), self.context_providers, NoteType.EVENT, domain_config.name),
-                project=ContextFolder(domain_config.project, os.path.join(self.path, domain_config.name, "project"), self.context_providers, NoteType.PROJECT, domain_config.name),
-                zettel=NoteFolder(os.path.join(self.path, domain_config.name, "zettel"), NoteType.ZETTEL, domain_config.name)
+                event=ContextFolder(domain_config.event, os.path.join(self.path, domain_config.name, "event"), self.context_providers, NoteType.EVENT, domain_config.name, **context_folder_options),
+                project=ContextFolder(domain_config.project, os.path.join(self.path, domain_config.name, "project"), self.context_providers, NoteType.PROJECT, domain_config.name, **context_folder_options),
+                zettel=NoteFolder(os.path.join(self.path, domain_config.name, "zettel"), NoteType.ZETTEL, domain_config.name, **folder_options)
             )
             for domain_config in config.domains
         }
 
-    def edit_note(self, note: Note):
-        subprocess.Popen([*self.editor, note.filepath])
+        self.snapshot_path = config.snapshot_path
+        if self.snapshot_path is not None:
+            self.restore_snapshot()
+
+        self.watcher = None
+        self.link_graph = LinkGraph(self.folders)
+        self.title_propagator = TitlePropagator(self.link_graph, self.folders)
+        self.search_index = SearchIndex(self.folders)
+        self.sync_thread = None
+
+        if sync:
+            self.sync()
+
+    def sync(self, force: bool = False):
+        '''Fetch the items of all context providers concurrently, and match the notes of the context folders with them
+
+        Unless forced, providers may answer from their cache.
+        '''
+        if force:
+            for provider in self.context_providers.values():
+                provider.invalidate()
+        errors = SyncScheduler(self.provider_timeouts).sync([f for f in self.folders if isinstance(f, ContextFolder)])
+        for folder, error in errors.items():
+            print(f"Failed to sync {folder.path}: {error}")
+        self.title_propagator.flush()
+        return errors
+
+    def relink(self):
+        '''Repair the titles of all links which no longer match the title of the note they point to
+        '''
+        return self.title_propagator.relink()
+
+    def migrate_layout(self):
+        '''Move all note files to where the configured layout wants them, repairing the links to and from them
+        '''
+        result = migrate_layout(self.folders, self.link_graph)
+        print(f"Moved {result.moved} notes and rewrote the links of {result.rewritten} notes")
+        return result
+
+    def sync_in_background(self, force: bool = False):
+        if not self.syncing:
+            self.sync_thread = threading.Thread(target=self.sync, args=(force,), name="NoteboxSync", daemon=True)
+            self.sync_thread.start()
 
-    def link(self, note1: Note, note2: Note):
-        note1.pull()
-        note2.pull()
+    @property
+    def syncing(self):
+        return self.sync_thread is not None and self.sync_thread.is_alive()
 
-        for note_from, note_to in [(note1, note2), (note2, note1)]:
-            link = Link(note_to.body.title, os.path.relpath(note_to.filepath, note_from.folder_path))
+    def restore_snapshot(self):
+        '''Fill the folders with the notes of the snapshot, if there is one
 
-            if note_to.note_type == NoteType.ZETTEL:
-                links = note_from.body.links
-            else:
-                links = note_from.body.references
+        Folders check the notes against their files when they are first used.
+        '''
+        snapshot = read_snapshot(self.snapshot_path)
+        if snapshot is None:
+            return False
+        for folder in self.folders:
+            restore_folder(folder, snapshot.get(folder.path, []))
+        return True
+
+    def snapshot(self):
+        '''Write all notes into the snapshot, returning the number of notes written
+        '''
+        return write_snapshot(self.snapshot_path, self.folders)
+
+    def watch(self):
+        '''Start applying changes made to the note files to the folders in the background, instead of re-pulling
+        '''
+        if self.watcher is None:
+            self.watcher = create_watcher(self.folders)
+            self.watcher.start()
+
+    def unwatch(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
 
-            if link.path not in [l.path for l in links]:
-                links.append(link)
+    def edit_note(self, note: Note):
+        subprocess.Popen([*self.editor, note.filepath])
 
-        note1.push()
-        note2.push()
+    def link(self, note1: Note, note2: Note):
+        self.link_many(note1, [note2])
+
+    def link_many(self, note: Note, others: List[Note]):
+        '''Link note with each of others in both directions, reading and writing every affected note only once
+
+        Returns the number of links added. Notes which aren't those of their folder, like search hits built from the
+        index, are swapped for the notes of the folder.
+        '''
+        note = self.own_note(note)
+        others = [o for o in map(self.own_note, others) if o is not None]
+        notes = {n.filepath: n for n in [note, *others]}
+        for n in notes.values():
+            n.pull()
+
+        added = 0
+        for other in notes.values():
+            if other is note:
+                continue
+            for note_from, note_to in [(note, other), (other, note)]:
+                link = Link(note_to.body.title, os.path.relpath(note_to.filepath, note_from.directory))
+
+                if note_to.note_type == NoteType.ZETTEL:
+                    links = note_from.body.links
+                else:
+                    links = note_from.body.references
+
+                if link.path not in [l.path for l in links]:
+                    links.append(link)
+                    added += 1
+
+        for n in notes.values():
+            self.folder_of(n).push_note(n)
+            self.folder_of(n).update(n)
+        return added
 
     @property
     def folders(self):
@@ -81,6 +201,14 @@ class Notebox:
             ]
         ]
 
+    def own_note(self, note: Note):
+        '''The note of the folder of note with its uid, loading the folder if needed
+        '''
+        return self.folder_of(note).own_note(note)
+
+    def folder_of(self, note: Note):
+        return {folder.path: folder for folder in self.folders}[note.folder_path]
+
     @property
     def folder_tree(self):
         return dict(
@@ -96,15 +224,13 @@ class Notebox:
             }
         )
 
-    def clean(self):
-        for folder in self.folders:
-            folder.pull()
-            os.chdir(folder.path)
-            print(f"Removing empty notes in {folder.path}: ", end='')
-            for note in folder.notes:
-                if note.is_empty:
-                    print(".", end='')
-                    note.delete()
-                    continue
-            print('')
-
+    def clean(self, dry_run: bool = False):
+        '''Remove the notes without content, links or references, or only report them when dry_run
+        '''
+        results = clean_folders(self.folders, dry_run)
+        for result in results:
+            if result.scanned == 0:
+                continue
+            action = "Found" if dry_run else "Removed"
+            print(f"{action} {len(result.empty)} empty notes in {result.folder.path} ({result.candidates} of {result.scanned} read)")
+        return results
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Set
+
+from notebox.note import Note, Link
+from notebox.note_folder import NoteFolder, NoteEvent
+from notebox.link_graph import LinkGraph
+
+
+class TitlePropagator:
+    '''Keeps the titles of links up to date with the titles of the notes they point to
+
+    Renamed notes are collected as their folders report them, and flush rewrites only the notes which link to them,
+    found through the reverse index of the link graph. Notes are written once per flush, however many of their links
+    changed.
+    '''
+
+    def __init__(self, link_graph: LinkGraph, folders: List[NoteFolder]):
+        self.link_graph = link_graph
+        self.folders_by_path: Dict[str, NoteFolder] = {folder.path: folder for folder in folders}
+        self.pending: Set[str] = set()
+        self.lock = threading.Lock()
+        for folder in folders:
+            folder.subscribe(self.on_event)
+
+    def on_event(self, event: NoteEvent, note: Note):
+        # Called with the folder lock held, so rewriting other folders is left to flush
+        if event == NoteEvent.RENAMED:
+            with self.lock:
+                self.pending.add(note.filepath)
+
+    def flush(self):
+        '''Rewrite the links to all notes renamed since the last flush, returning the number of notes written
+        '''
+        with self.lock:
+            renamed, self.pending = self.pending, set()
+        if len(renamed) == 0:
+            return 0
+        self.link_graph.build()
+        with self.link_graph.lock:
+            referrers = {
+                referrer.filepath: referrer
+                for path in renamed
+                for referrer in self.link_graph._notes(self.link_graph.reverse.get(path, set()))
+            }
+        return sum(self.repair(note) for note in referrers.values())
+
+    def relink(self, max_workers: int = 8):
+        '''Repair the stale link titles of all notes, with the folders in parallel, returning the number of notes written
+        '''
+        self.link_graph.build()
+        with self.lock:
+            self.pending = set()
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="Relink") as executor:
+            return sum(executor.map(
+                lambda folder: sum(self.repair(note) for note in folder.notes),
+                self.folders_by_path.values(),
+            ))
+
+    def repair(self, note: Note):
+        '''Give the links of note the current titles of their targets, and write it if any changed
+        '''
+        folder = self.folders_by_path[note.folder_path]
+        with folder.lock:
+            changed = False
+            for links in [note.body.links, note.body.references]:
+                for n, link in enumerate(links):
+                    target = self.link_graph.notes_by_path.get(os.path.normpath(os.path.join(note.directory, link.path)))
+                    if target is not None and target.body.title != link.title:
+                        links[n] = Link(target.body.title, link.path)
+                        changed = True
+            if not changed:
+                return False
+            folder.push_note(note)
+            folder.update(note)
+            return True
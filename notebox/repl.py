@@ -2,17 +2,23 @@
 
 import sys
 import os
+import cProfile
+import queue
+import logging
+import threading
 import subprocess
 from dataclasses import dataclass
 from typing import List, Any, Callable
 
-from prompt_toolkit import PromptSession
-from prompt_toolkit.completion import Completer, Completion 
+from prompt_toolkit import PromptSession, prompt
+from prompt_toolkit.completion import Completer, Completion, ThreadedCompleter
 
 from notebox.notebox import Notebox
 from notebox.note_folder import NoteFolder
 from notebox.config import Config
 from notebox.note import NoteType
+from notebox.matcher import TitleMatcher
+from notebox.stats import stats
 
 
 @dataclass
@@ -22,6 +28,60 @@ class Command:
     argopts: Any = None
 
 
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = os.path.join(os.getenv('HOME', ''), ".notebox", "config.yaml")
+
+
+class BackgroundRefresher:
+    '''Pulls folders and builds their title matchers in a background thread, so completion never waits on disk I/O
+
+    Completion reads from the matchers, which only hold in-memory data and are updated note by note as a pull
+    progresses.
+    '''
+
+    def __init__(self):
+        self.matchers = dict()
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="BackgroundRefresher", daemon=True)
+        self.thread.start()
+
+    @property
+    def busy(self):
+        return len(self.pending) > 0
+
+    def request(self, folder: NoteFolder, pull: bool = True):
+        with self.lock:
+            if (folder, pull) in self.pending:
+                return
+            self.pending.add((folder, pull))
+        self.queue.put((folder, pull))
+
+    def matcher(self, folder: NoteFolder):
+        '''The matcher of a folder, or None while it is still being built
+        '''
+        matcher = self.matchers.get(folder)
+        if matcher is None:
+            self.request(folder, pull=False)
+        return matcher
+
+    def run(self):
+        while True:
+            folder, pull = self.queue.get()
+            try:
+                if pull and not folder.watched:
+                    folder.pull()
+                if folder not in self.matchers:
+                    self.matchers[folder] = TitleMatcher(folder)
+            except Exception:
+                logger.exception(f"Failed to refresh {folder.path}")
+            finally:
+                with self.lock:
+                    self.pending.discard((folder, pull))
+
+
 class NoteCompleter(Completer):
 
     STYLE_BG_DEFAULT = "bg:#BBBBBB"
@@ -30,8 +90,11 @@ class NoteCompleter(Completer):
     STYLE_FG = "fg:#333333"
     STYLE_FG_SELECTED = "fg:ansiblack bold"
 
-    def __init__(self, commands: List[Command]):
+    MAX_COMPLETIONS = 50
+
+    def __init__(self, commands: List[Command], refresher: BackgroundRefresher):
         self.opt_tree = {c.name: c.argopts for c in commands}
+        self.refresher = refresher
         super().__init__()
 
     def get_style(self, selected: bool, flagged: bool = False):
@@ -39,18 +102,14 @@ class NoteCompleter(Completer):
         fg = self.STYLE_FG_SELECTED if selected else self.STYLE_FG
         return f"{bg} {fg}"
 
-    def fuzzy_match(self, substring, options, position, title_func, uid_func = None, flag_func = lambda n: False):
-        words = [w.lower() for w in substring.split(' ')]
-        uid_func = title_func if uid_func is None else uid_func
-        for option in sorted(options, key=lambda o: not flag_func(o)):
-            display_title = title_func(option)
-            match_title = display_title.lower()
-            if all([w in match_title for w in words]):
-                uid = uid_func(option)
-                flagged = flag_func(option)
-                style = self.get_style(False, flagged)
-                selected_style = self.get_style(True, flagged)
-                yield Completion(uid, -position, display_title, style=style, selected_style=selected_style)
+    def fuzzy_match(self, substring, folder, position):
+        matcher = self.refresher.matcher(folder)
+        if matcher is None:
+            return
+        for note in matcher.match(substring, self.MAX_COMPLETIONS):
+            style = self.get_style(False, note.flagged)
+            selected_style = self.get_style(True, note.flagged)
+            yield Completion(note.uid, -position, note.body.title, style=style, selected_style=selected_style)
 
     def get_subcompletions(self, subcmd, subopt, position):
         if subopt is None:
@@ -65,9 +124,9 @@ class NoteCompleter(Completer):
                     if k.startswith(subcmd):
                         yield Completion(k, -position, style=self.get_style(False), selected_style=self.get_style(True))
         elif isinstance(subopt, NoteFolder):
-            if position == 0:
-                subopt.pull()
-            for completion in self.fuzzy_match(subcmd, [n for n in subopt.notes], position, lambda n: n.body.title, lambda n: n.uid, lambda n: n.flagged):
+            if position == 0 and not subopt.watched:
+                self.refresher.request(subopt)
+            for completion in self.fuzzy_match(subcmd, subopt, position):
                 yield completion
 
     def get_completions(self, document, complete_event):
@@ -109,25 +168,45 @@ def no_args(f):
 
 class ApplicationREPL:
 
-    def __init__(self):
-        self.notebox = Notebox(Config.from_yaml_file(os.path.join(os.getenv('HOME'), ".notebox", "config.yaml")))
+    def __init__(self, config: Config = None):
+        if config is None:
+            config = Config.from_yaml_file(CONFIG_PATH)
+        self.notebox = Notebox(config, sync=False)
+        self.notebox.sync_in_background()
+        self.notebox.watch()
         self.selected_note = None
+        self.search_hits = []
+        self.marked_notes = []
 
         self.commands = [
             Command("link", self.link_command, self.notebox.folder_tree),
+            Command("mark", self.mark_command, self.notebox.folder_tree),
+            Command("linkmarked", self.link_marked_command),
+            Command("linkhits", self.link_hits_command),
+            Command("backlinks", self.backlinks_command),
+            Command("neighbours", self.neighbours_command),
+            Command("search", self.search_command),
             Command("deselect", self.deselect_command),
             Command("edit", self.edit_note_command),
             Command("start", self.start_command),
             Command("stop", self.stop_command),
-            Command("clean", self.clean_command),
+            Command("sync", self.sync_command),
+            Command("relink", self.relink_command),
+            Command("snapshot", self.snapshot_command),
+            Command("migrate", self.migrate_command),
+            Command("stats", self.stats_command, dict(reset=None)),
+            Command("clean", self.clean_command, {'--dry-run': None}),
             Command("quit", self.quit_command)
         ] + [
             Command(top_name, self.select_wrapper(top_name), subtree)
             for top_name, subtree in self.notebox.folder_tree.items()
         ]
 
-        self.completer = NoteCompleter(self.commands)
-        self.session = PromptSession(completer=self.completer)
+        self.refresher = BackgroundRefresher()
+        for folder in self.notebox.folders:
+            self.refresher.request(folder, pull=False)
+        self.completer = NoteCompleter(self.commands, self.refresher)
+        self.session = PromptSession(completer=ThreadedCompleter(self.completer), refresh_interval=0.5)
 
     def select_wrapper(self, type_name):
         def wrapper(uid_or_title):
@@ -153,6 +232,8 @@ class ApplicationREPL:
         for c in self.commands:
             if command == c.name:
                 c.func(params)
+                # Titles changed by the command, or by editing notes meanwhile, are carried over to the links to them
+                self.notebox.title_propagator.flush()
                 return
         else:
             print(f"Unknown command {command}")
@@ -165,12 +246,76 @@ class ApplicationREPL:
             note_type_indicator = self.selected_note.note_type.value[0].upper()
             note_domain = self.selected_note.domain.upper() if self.selected_note.domain is not None else ' '
 
-        return f"[{note_domain}] [{note_type_indicator}] {self.selected_note.body.title if self.selected_note is not None else '-'}"
+        if self.notebox.syncing:
+            refreshing = " (syncing...)"
+        elif self.refresher.busy:
+            refreshing = " (refreshing...)"
+        else:
+            refreshing = ""
+        return f"[{note_domain}] [{note_type_indicator}] {self.selected_note.body.title if self.selected_note is not None else '-'}{refreshing}"
 
     @with_note
     def link_command(self, note):
         self.notebox.link(self.selected_note, note)
 
+    @with_note
+    def mark_command(self, note):
+        if note not in self.marked_notes:
+            self.marked_notes.append(note)
+        print(f"{len(self.marked_notes)} notes marked")
+
+    @no_args
+    def link_marked_command(self):
+        if self.selected_note is None:
+            print('please select a note first')
+            return
+        added = self.notebox.link_many(self.selected_note, self.marked_notes)
+        print(f"linked {len(self.marked_notes)} notes, {added} links added")
+        self.marked_notes = []
+
+    @with_args('numbers')
+    def link_hits_command(self, numbers):
+        if self.selected_note is None:
+            print('please select a note first')
+            return
+        if numbers:
+            hits = [self.search_hits[int(n) - 1] for n in numbers.split(' ') if n.isdigit() and 0 < int(n) <= len(self.search_hits)]
+        else:
+            hits = self.search_hits
+        added = self.notebox.link_many(self.selected_note, [hit.note for hit in hits])
+        print(f"linked {len(hits)} notes, {added} links added")
+
+    @no_args
+    def backlinks_command(self):
+        if self.selected_note is None:
+            print('please select a note first')
+            return
+        for note in self.notebox.link_graph.backlinks(self.selected_note):
+            print(note.body.title)
+
+    @with_args('hops')
+    def neighbours_command(self, hops):
+        if self.selected_note is None:
+            print('please select a note first')
+            return
+        for note, distance in self.notebox.link_graph.neighbours(self.selected_note, int(hops) if hops else 2):
+            print(f"{distance} {note.body.title}")
+
+    @with_args('query')
+    def search_command(self, query):
+        if not query:
+            print('please enter a search query')
+            return
+        self.search_hits = self.notebox.search_index.search(query)
+        if len(self.search_hits) == 0:
+            print('no matches')
+            return
+        for n, hit in enumerate(self.search_hits, 1):
+            print(f"{n:>3} {hit.note.note_type.value[0].upper()} {hit.note.body.title}")
+        choice = prompt('select (empty to skip): ')
+        if choice.strip().isdigit() and 0 < int(choice) <= len(self.search_hits):
+            self.selected_note = self.notebox.own_note(self.search_hits[int(choice) - 1].note)
+
     @with_note
     def select_command(self, note):
         self.selected_note = note
@@ -205,15 +350,67 @@ class ApplicationREPL:
         self.notebox.edit_note(self.selected_note)
 
     @no_args
-    def clean_command(self):
-        self.notebox.clean()
+    def sync_command(self):
+        self.notebox.sync(force=True)
+
+    @no_args
+    def relink_command(self):
+        print(f"{self.notebox.relink()} notes rewritten")
+
+    @no_args
+    def snapshot_command(self):
+        if self.notebox.snapshot_path is None:
+            print('please configure a snapshot_path first')
+            return
+        print(f"{self.notebox.snapshot()} notes written to {self.notebox.snapshot_path}")
+
+    @no_args
+    def migrate_command(self):
+        self.notebox.migrate_layout()
+
+    @with_args('action')
+    def stats_command(self, action):
+        if not stats.enabled:
+            print('stats are disabled, enable them with stats: true in the config or NOTEBOX_STATS=1')
+            return
+        if action == 'reset':
+            stats.reset()
+            return
+        print(stats.report())
+
+    @with_args('flags')
+    def clean_command(self, flags):
+        self.notebox.clean(dry_run=flags == '--dry-run')
 
     @no_args
     def quit_command(self):
+        self.notebox.unwatch()
         self.notebox.clean()
+        if self.notebox.snapshot_path is not None:
+            self.notebox.snapshot()
         exit()
 
 
 def main():
-    ApplicationREPL().run()
+    config = Config.from_yaml_file(CONFIG_PATH)
+    if sys.argv[1:] == ["snapshot"]:
+        if config.snapshot_path is None:
+            sys.exit("please configure a snapshot_path first")
+        notebox = Notebox(config, sync=False)
+        print(f"{notebox.snapshot()} notes written to {config.snapshot_path}")
+        return
+    if sys.argv[1:] == ["migrate"]:
+        Notebox(config, sync=False).migrate_layout()
+        return
+    stats.enabled = config.stats
+    profile = None
+    if config.profile_path is not None:
+        profile = cProfile.Profile()
+        profile.enable()
+    try:
+        ApplicationREPL(config).run()
+    finally:
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(os.path.expanduser(config.profile_path))
 
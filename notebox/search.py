@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import math
+import heapq
+import shutil
+import threading
+import subprocess
+from dataclasses import dataclass
+from typing import Dict, List, Set
+
+import yaml
+
+from notebox.note import Note, NoteBody, MalformedNoteException
+from notebox.note_folder import NoteFolder, NoteEvent
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def tokenize(text: str):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+@dataclass
+class SearchQuery:
+    terms: List[str]
+    phrases: List[List[str]]
+
+    @classmethod
+    def parse(cls, query: str):
+        '''Parse a query of words and double quoted phrases, all of which should match
+        '''
+        terms = []
+        phrases = []
+        for phrase, word in QUERY_PATTERN.findall(query):
+            if phrase:
+                tokens = tokenize(phrase)
+                if len(tokens) > 1:
+                    phrases.append(tokens)
+                terms.extend(tokens)
+            else:
+                terms.extend(tokenize(word))
+        return cls(terms=list(dict.fromkeys(terms)), phrases=phrases)
+
+
+@dataclass
+class SearchHit:
+    note: Note
+    score: float
+
+
+def note_tokens(body: NoteBody):
+    '''Tokens of the title, extra attributes and content of a note, in order
+    '''
+    return [
+        *tokenize(str(body.title)),
+        *[t for k, v in body.extra_attributes.items() for t in tokenize(f"{k} {v}")],
+        *tokenize(body.content),
+    ]
+
+
+def contains_phrase(positions: List[Set[int]], phrase_length: int):
+    return any(all(p + i in positions[i] for i in range(1, phrase_length)) for p in positions[0])
+
+
+def frequency_score(parsed: SearchQuery, tokens: List[str]):
+    '''Score of tokens on term frequency, or None when they don't match every term and phrase
+    '''
+    positions = dict()
+    for position, token in enumerate(tokens):
+        positions.setdefault(token, set()).add(position)
+    if not all(term in positions for term in parsed.terms):
+        return None
+    if not all(contains_phrase([positions[t] for t in phrase], len(phrase)) for phrase in parsed.phrases):
+        return None
+    return sum(len(positions[term]) for term in parsed.terms) / math.sqrt(len(tokens))
+
+
+def ripgrep_files(term: str, root: str):
+    '''Note files under root containing term in any case, or None when ripgrep is not available or fails
+    '''
+    rg = shutil.which("rg")
+    if rg is None:
+        return None
+    try:
+        result = subprocess.run(
+            [rg, "--files-with-matches", "--ignore-case", "--fixed-strings", "--glob", "*.md", "--", term, root],
+            capture_output=True, text=True,
+        )
+    except OSError:
+        return None
+    # Exit status 1 means nothing matched, anything other than that or 0 is an error
+    if result.returncode == 1:
+        return []
+    if result.returncode != 0:
+        return None
+    return [os.path.abspath(line) for line in result.stdout.split("\n") if line != ""]
+
+
+class SearchIndex:
+    '''Inverted index over the notes of a set of folders, with BM25 ranking and phrase queries
+
+    The index is built in a background thread on the first search, and kept up to date afterwards through the events
+    of the folders. Until it is built, searches fall back on ripgrep, or on scanning the files when ripgrep is not
+    available or fails. Those searches leave folders which aren't loaded yet alone, and only match the titles and
+    extra attributes of their notes in the persistent index.
+    '''
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, folders: List[NoteFolder]):
+        self.folders = folders
+        self.postings: Dict[str, Dict[str, List[int]]] = dict()
+        self.lengths: Dict[str, int] = dict()
+        self.tokens_by_path: Dict[str, Set[str]] = dict()
+        self.notes_by_path: Dict[str, Note] = dict()
+        self.total_length = 0
+        self.lock = threading.RLock()
+        self.started = False
+        self.built = threading.Event()
+        for folder in folders:
+            folder.subscribe(self.on_event)
+
+    def on_event(self, event: NoteEvent, note: Note):
+        if not self.started:
+            return
+        if event == NoteEvent.REMOVED:
+            self.remove(note)
+        else:
+            self.add(note)
+
+    def build(self):
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        for folder in self.folders:
+            for note in folder.notes:
+                if folder.notes_by_id.get(note.uid) is note:
+                    self.add(note)
+        self.built.set()
+
+    def build_in_background(self):
+        if not self.started:
+            threading.Thread(target=self.build, name="SearchIndex", daemon=True).start()
+
+    def add(self, note: Note):
+        path = note.filepath
+        tokens = note_tokens(note.body)
+        positions = dict()
+        for position, token in enumerate(tokens):
+            positions.setdefault(token, []).append(position)
+        with self.lock:
+            self.remove(note)
+            for token, token_positions in positions.items():
+                self.postings.setdefault(token, dict())[path] = token_positions
+            self.lengths[path] = len(tokens)
+            self.tokens_by_path[path] = set(positions.keys())
+            self.total_length += len(tokens)
+            self.notes_by_path[path] = note
+
+    def remove(self, note: Note):
+        path = note.filepath
+        with self.lock:
+            if path not in self.notes_by_path:
+                return
+            for token in self.tokens_by_path.pop(path):
+                postings = self.postings.get(token)
+                if postings is not None:
+                    postings.pop(path, None)
+                    if len(postings) == 0:
+                        del self.postings[token]
+            self.total_length -= self.lengths.pop(path)
+            del self.notes_by_path[path]
+
+    def search(self, query: str, limit: int = 20) -> List[SearchHit]:
+        parsed = SearchQuery.parse(query)
+        if len(parsed.terms) == 0:
+            return []
+        if not self.built.is_set():
+            self.build_in_background()
+            return self.search_files(parsed, limit)
+        with self.lock:
+            term_postings = [self.postings.get(term, dict()) for term in parsed.terms]
+            candidates = set.intersection(*[set(p.keys()) for p in term_postings])
+            average_length = self.total_length / max(len(self.lengths), 1)
+            scores = []
+            for path in candidates:
+                positions = {term: postings[path] for term, postings in zip(parsed.terms, term_postings)}
+                if not all(contains_phrase([set(positions[t]) for t in phrase], len(phrase)) for phrase in parsed.phrases):
+                    continue
+                score = sum(
+                    self._idf(len(postings)) * self._term_score(len(positions[term]), self.lengths[path], average_length)
+                    for term, postings in zip(parsed.terms, term_postings)
+                )
+                scores.append((score, path))
+            return [SearchHit(self.notes_by_path[path], score) for score, path in heapq.nlargest(limit, scores)]
+
+    def _idf(self, document_frequency: int):
+        n = len(self.lengths)
+        return math.log(1 + (n - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def _term_score(self, term_frequency: int, length: int, average_length: float):
+        return term_frequency * (self.K1 + 1) / (
+            term_frequency + self.K1 * (1 - self.B + self.B * length / average_length)
+        )
+
+    def search_files(self, parsed: SearchQuery, limit: int) -> List[SearchHit]:
+        '''Search the files of the loaded folders, and the indexed notes of the others, ranking matches on term frequency
+        '''
+        loaded = [folder for folder in self.folders if folder.loaded]
+        notes_by_path = {note.filepath: note for folder in loaded for note in folder.notes}
+        hits = []
+        for path in self._candidate_paths(parsed, notes_by_path, loaded):
+            note = notes_by_path.get(path)
+            if note is None:
+                continue
+            try:
+                with open(path) as f:
+                    score = frequency_score(parsed, note_tokens(NoteBody.from_string(f.read())))
+            except (OSError, MalformedNoteException, yaml.YAMLError, KeyError):
+                continue
+            if score is not None:
+                hits.append(SearchHit(note, score))
+        for folder in self.folders:
+            if folder.loaded:
+                continue
+            for note in folder.indexed_notes():
+                score = frequency_score(parsed, note_tokens(NoteBody(note.body.title, note.body.extra_attributes)))
+                if score is not None:
+                    hits.append(SearchHit(note, score))
+        return heapq.nlargest(limit, hits, key=lambda hit: hit.score)
+
+    def _candidate_paths(self, parsed: SearchQuery, notes_by_path: Dict[str, Note], folders: List[NoteFolder]):
+        '''Files containing the rarest looking (longest) term according to ripgrep, or all files without ripgrep
+        '''
+        if len(folders) == 0:
+            return []
+        paths = ripgrep_files(max(parsed.terms, key=len), os.path.commonpath([folder.path for folder in folders]))
+        return notes_by_path.keys() if paths is None else paths
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import pickle
+import struct
+import tempfile
+from typing import Dict, List, Tuple
+
+from notebox.note import Note, NoteBody, LazyNoteBody, Link, MalformedNoteException, content_digest
+from notebox.note_folder import NoteFolder, fingerprint
+
+
+SNAPSHOT_MAGIC = b"NOTEBOX-SNAPSHOT"
+SNAPSHOT_VERSION = 2
+SNAPSHOT_HEADER = struct.Struct(f">{len(SNAPSHOT_MAGIC)}sI")
+
+# uid, subdir, fingerprint, digest, title, extra attributes, content, links and references, with links as (title, path)
+SnapshotEntry = Tuple[str, str, Tuple[int, int, int], bytes, str, dict, str, List[Tuple[str, str]], List[Tuple[str, str]]]
+
+
+def snapshot_entry(note: Note, stat: os.stat_result) -> SnapshotEntry:
+    body = note.body.to_body() if isinstance(note.body, LazyNoteBody) else note.body
+    return (
+        note.uid,
+        note.subdir,
+        fingerprint(stat),
+        note.digest,
+        body.title,
+        body.extra_attributes,
+        body.content,
+        [(l.title, l.path) for l in body.links],
+        [(l.title, l.path) for l in body.references],
+    )
+
+
+def folder_entries(folder: NoteFolder) -> List[SnapshotEntry]:
+    '''Entries of all notes of folder as they are on disk, reusing the notes in memory which are unchanged
+    '''
+    entries = []
+    if not os.path.isdir(folder.path):
+        return entries
+    for entry in folder.scan():
+        uid = entry.name[:-3]
+        try:
+            stat = entry.stat()
+            note = folder.current_note(uid, stat)
+            # A note in memory is only used when it has no unpushed changes
+            if note is None or note.digest is None or content_digest(note.body.to_string()) != note.digest:
+                note = Note.load(entry.path, folder.note_type, folder.domain, folder_path=folder.path)
+        except (FileNotFoundError, MalformedNoteException):
+            continue
+        entries.append(snapshot_entry(note, stat))
+    return entries
+
+
+def write_snapshot(path: str, folders: List[NoteFolder]):
+    '''Write the parsed notes of all folders into a single file at path, replacing it atomically
+    '''
+    path = os.path.expanduser(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    data = {folder.path: folder_entries(folder) for folder in folders}
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".", suffix=".tmp")
+    with os.fdopen(fd, 'wb') as f:
+        f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION))
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return sum(len(entries) for entries in data.values())
+
+
+def read_snapshot(path: str) -> Dict[str, List[SnapshotEntry]]:
+    '''Snapshot entries by folder path, or None when there is no snapshot of the current version at path
+    '''
+    try:
+        with open(os.path.expanduser(path), 'rb') as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return None
+    if len(raw) < SNAPSHOT_HEADER.size or SNAPSHOT_HEADER.unpack_from(raw) != (SNAPSHOT_MAGIC, SNAPSHOT_VERSION):
+        return None
+    try:
+        return pickle.loads(memoryview(raw)[SNAPSHOT_HEADER.size:])
+    except (pickle.UnpicklingError, EOFError, ValueError):
+        return None
+
+
+def restore_folder(folder: NoteFolder, entries: List[SnapshotEntry]):
+    '''Fill a folder which hasn't been read yet with the notes of a snapshot
+
+    Its first pull then only stats the files, and reads those which changed since the snapshot was written.
+    '''
+    folder.restore([
+        Note(
+            uid=uid,
+            folder_path=folder.path,
+            note_type=folder.note_type,
+            body=NoteBody(
+                title=title,
+                extra_attributes=extra_attributes,
+                content=content,
+                links=[Link(link_title, sys.intern(link_path)) for link_title, link_path in links],
+                references=[Link(link_title, sys.intern(link_path)) for link_title, link_path in references],
+            ),
+            domain=folder.domain,
+            digest=digest,
+            subdir=sys.intern(subdir),
+        )
+        for uid, subdir, _, digest, title, extra_attributes, content, links, references in entries
+    ], {entry[0]: entry[2] for entry in entries})
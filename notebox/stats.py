@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+import time
+import bisect
+import functools
+import threading
+import contextlib
+from typing import Dict
+
+
+class Histogram:
+    '''Latencies in buckets of which the bounds double, from 1us up
+    '''
+
+    BOUNDS = [2 ** i / 1e6 for i in range(32)]
+
+    def __init__(self):
+        self.buckets = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        self.buckets[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p: float):
+        '''Upper bound of the bucket holding the p-th percentile
+        '''
+        rank = p / 100 * self.count
+        seen = 0
+        for bound, n in zip(self.BOUNDS, self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Stats:
+    '''Counters and latency histograms, which are only kept while enabled
+    '''
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.counters: Dict[str, int] = dict()
+        self.histograms: Dict[str, Histogram] = dict()
+
+    def count(self, name: str, n: int = 1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def record(self, name: str, seconds: float):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.record(seconds)
+
+    @contextlib.contextmanager
+    def timer(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def reset(self):
+        with self.lock:
+            self.counters = dict()
+            self.histograms = dict()
+
+    def report(self):
+        with self.lock:
+            lines = [f"{'':<40} {'count':>8} {'total ms':>10} {'mean ms':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+            for name, h in sorted(self.histograms.items()):
+                lines.append(
+                    f"{name:<40} {h.count:>8} {h.total * 1e3:>10.1f} {h.total / h.count * 1e3:>9.3f} "
+                    f"{h.percentile(50) * 1e3:>9.3f} {h.percentile(90) * 1e3:>9.3f} {h.percentile(99) * 1e3:>9.3f} {h.max * 1e3:>9.3f}"
+                )
+            for name, n in sorted(self.counters.items()):
+                lines.append(f"{name:<40} {n:>8}")
+        return "\n".join(lines)
+
+
+stats = Stats()
+
+
+def timed(name: str):
+    '''Record the latency of every call of the decorated function in the histogram name, while stats are enabled
+    '''
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if not stats.enabled:
+                return f(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                stats.record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+import json
+import time
+import threading
+from concurrent.futures import Future, TimeoutError
+from typing import Callable, Dict, List
+
+from notebox.context_folder import ContextFolder
+
+
+def submit_daemon(func: Callable, semaphore: threading.Semaphore) -> Future:
+    '''Run func in a daemon thread, once the semaphore lets it
+
+    Unlike the workers of an executor, the thread is not joined at exit, so a provider call which hangs can't keep
+    the process from quitting.
+    '''
+    future = Future()
+
+    def run():
+        with semaphore:
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(func())
+            except BaseException as e:
+                future.set_exception(e)
+
+    threading.Thread(target=run, name="SyncScheduler", daemon=True).start()
+    return future
+
+
+class SyncScheduler:
+    '''Fetches the provider items of a set of context folders concurrently, and reconciles every folder with them
+
+    Folders asking the same provider for the same filter share a single fetch. Every fetch is bounded by the timeout
+    of its provider. A folder of which the fetch fails or times out keeps its notes as they are.
+    '''
+
+    def __init__(self, timeouts: Dict[str, float] = None, default_timeout: float = 30, max_workers: int = 8):
+        self.timeouts = timeouts if timeouts is not None else dict()
+        self.default_timeout = default_timeout
+        self.max_workers = max_workers
+
+    @staticmethod
+    def request_key(folder: ContextFolder):
+        return folder.provider_name, json.dumps(folder.provider_filter, sort_keys=True, default=str)
+
+    def sync(self, folders: List[ContextFolder]) -> Dict[ContextFolder, Exception]:
+        '''Sync all folders which have a provider, returning the error for every folder that could not be synced
+        '''
+        requests = dict()
+        for folder in folders:
+            if folder.provider is not None:
+                requests.setdefault(self.request_key(folder), []).append(folder)
+        if len(requests) == 0:
+            return dict()
+
+        start = time.monotonic()
+        semaphore = threading.Semaphore(self.max_workers)
+        futures = {key: submit_daemon(request_folders[0].fetch_items, semaphore) for key, request_folders in requests.items()}
+        deadlines = {key: start + self.timeouts.get(key[0], self.default_timeout) for key in requests}
+
+        errors = dict()
+        for key in sorted(futures, key=lambda k: deadlines[k]):
+            try:
+                items = futures[key].result(timeout=max(0, deadlines[key] - time.monotonic()))
+            except TimeoutError:
+                items = None
+                error = TimeoutError(f"Provider {key[0]} did not respond within {deadlines[key] - start:.0f}s")
+            except Exception as e:
+                items = None
+                error = e
+            for folder in requests[key]:
+                if items is None:
+                    errors[folder] = error
+                    continue
+                try:
+                    folder.sync(items)
+                except Exception as e:
+                    errors[folder] = e
+        for future in futures.values():
+            future.cancel()
+        return errors
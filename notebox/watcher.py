@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+import threading
+from typing import List
+
+from notebox.note_folder import NoteFolder
+
+
+logger = logging.getLogger(__name__)
+
+
+class FolderWatcher:
+    '''Keeps the notes of a set of folders up to date with changes made to their files, in a background thread
+    '''
+
+    def __init__(self, folders: List[NoteFolder]):
+        self.folders = folders
+        self.thread = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        for folder in self.folders:
+            folder.create_path_if_not_exists()
+        self.subscribe()
+        for folder in self.folders:
+            folder.watched = True
+        self.thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        for folder in self.folders:
+            folder.watched = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def subscribe(self):
+        pass
+
+    def run(self):
+        raise NotImplementedError
+
+    def _run(self):
+        '''Run until stopped, after which, or when the watcher fails, the folders are pulled again on use
+        '''
+        try:
+            self.run()
+        except Exception:
+            logger.exception(f"{type(self).__name__} stopped watching")
+        finally:
+            for folder in self.folders:
+                folder.watched = False
+
+    def pull(self, folder: NoteFolder):
+        try:
+            folder.pull()
+        except Exception:
+            logger.exception(f"Failed to pull {folder.path}")
+
+    def apply(self, folder: NoteFolder, path: str):
+        '''Bring the note of the file at path up to date, which drops it when the file is gone
+        '''
+        filename = os.path.basename(path)
+        if not filename.endswith(".md"):
+            return
+        try:
+            folder.pull_note(filename[:-3], path)
+        except Exception:
+            logger.exception(f"Failed to apply change to {path}")
+
+
+class PollingFolderWatcher(FolderWatcher):
+    '''Portable fallback, which periodically runs an incremental pull on every folder
+    '''
+
+    def __init__(self, folders: List[NoteFolder], interval: float = 1.0):
+        self.interval = interval
+        super().__init__(folders)
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            for folder in self.folders:
+                self.pull(folder)
+
+
+class InotifyFolderWatcher(FolderWatcher):
+    '''Applies Linux inotify events to the folders as soon as they arrive
+    '''
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, folders: List[NoteFolder]):
+        super().__init__(folders)
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # Folder and watched directory, which is the folder itself or one of its shards
+        self.directories_by_wd = dict()
+        self._wakeup_r, self._wakeup_w = os.pipe()
+
+    def subscribe(self):
+        for folder in self.folders:
+            for directory in [folder.path, *folder.shards()]:
+                self.watch(folder, directory)
+
+    def watch(self, folder: NoteFolder, directory: str):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+        self.directories_by_wd[wd] = (folder, directory)
+
+    def stop(self):
+        self._stopped.set()
+        os.write(self._wakeup_w, b"\0")
+        super().stop()
+        for fd in [self.fd, self._wakeup_r, self._wakeup_w]:
+            os.close(fd)
+
+    def run(self):
+        while not self._stopped.is_set():
+            readable, _, _ = select.select([self.fd, self._wakeup_r], [], [])
+            if self.fd not in readable:
+                continue
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            for wd, mask, name in self.parse_events(data):
+                if mask & self.IN_Q_OVERFLOW:
+                    for folder in self.folders:
+                        self.pull(folder)
+                    continue
+                watched = self.directories_by_wd.get(wd)
+                if watched is None:
+                    continue
+                folder, directory = watched
+                path = os.path.join(directory, name)
+                if mask & self.IN_ISDIR:
+                    if mask & (self.IN_CREATE | self.IN_MOVED_TO) and name.isdigit():
+                        self.watch_shard(folder, path)
+                    continue
+                self.apply(folder, path)
+
+    def watch_shard(self, folder: NoteFolder, path: str):
+        '''Watch a new shard, and pick up the notes which ended up in it before it was watched
+        '''
+        try:
+            for directory in [path, *folder.shards(path, depth=1)]:
+                self.watch(folder, directory)
+            folder.pull()
+        except Exception:
+            logger.exception(f"Failed to watch {path}")
+
+    def parse_events(self, data: bytes):
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            yield wd, mask, name
+
+
+def create_watcher(folders: List[NoteFolder], interval: float = 1.0) -> FolderWatcher:
+    '''Create an inotify watcher where available, falling back on polling elsewhere
+    '''
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyFolderWatcher(folders)
+        except (OSError, AttributeError):
+            pass
+    return PollingFolderWatcher(folders, interval)
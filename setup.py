@@ -5,6 +5,7 @@ setup(
     version='0.1.0',
     packages=find_packages('.'),
     description='',
+    python_requires='>=3.10',
     install_requires=[
         "pandas",
         "prompt_toolkit",
@@ -13,7 +14,6 @@ setup(
         "google-auth-httplib2",
         "google-auth-oauthlib",
         "todoist",
-        "ripgrepy",
         "iterfzf",
         "PyYAML",
         # Tests
@@ -0,0 +1,51 @@
+#!/usr/bin/env
+
+import os
+import contextlib
+
+import pytest
+
+from notebox.config import Config
+from notebox.stats import stats
+
+
+@pytest.fixture
+def write_note():
+    '''Function writing a note body to the file of uid in a folder
+    '''
+    def write(folder_path, uid, body):
+        with open(os.path.join(folder_path, uid + ".md"), 'w') as f:
+            f.write(body.to_string())
+    return write
+
+
+@pytest.fixture
+def notebox_config(tmp_path):
+    '''Function building the config of a notebox in tmp_path, with a provider which is never connected
+    '''
+    def config(**options):
+        return Config.from_dict(dict(
+            path=str(tmp_path),
+            editor="true",
+            context_providers=[dict(name="todoist", type="todoist", params=dict(api_key="unused"))],
+            source=dict(provider="todoist"),
+            domains=[],
+            **options,
+        ))
+    return config
+
+
+@pytest.fixture
+def record_stats():
+    '''Context manager recording stats from scratch while it is entered, which are reset after the test
+    '''
+    @contextlib.contextmanager
+    def record():
+        stats.reset()
+        stats.enabled = True
+        try:
+            yield stats
+        finally:
+            stats.enabled = False
+    yield record
+    stats.reset()
@@ -0,0 +1,65 @@
+#!/usr/bin/env
+
+import time
+
+import pytest
+
+from notebox.config import ContextFolderConfig
+from notebox.context_folder import ContextFolder
+from notebox.context_provider.base import ContextProvider, ContextProviderItem
+from notebox.context_provider.cache import CachedContextProvider, ContextProviderOffline
+from notebox.note import NoteType
+
+
+class CountingProvider(ContextProvider):
+
+    def __init__(self):
+        self.calls = 0
+        self.title = "first"
+
+    def get_items(self, filters):
+        self.calls += 1
+        return [ContextProviderItem(title=self.title, uid="1", service="fake")]
+
+
+def test_cache_fresh_stale_and_forced(tmp_path):
+    inner = CountingProvider()
+    provider = CachedContextProvider("fake", lambda: inner, str(tmp_path / "cache"), ttl=60)
+    filters = dict(project="a")
+
+    assert provider.get_items(filters)[0].title == "first"
+    assert provider.get_items(filters)[0].title == "first"
+    assert inner.calls == 1
+
+    refreshed = []
+    provider.subscribe(lambda f, items: refreshed.append(items[0].title))
+    provider.ttl = 0
+    inner.title = "second"
+    assert provider.get_items(filters)[0].title == "first"
+    for _ in range(100):
+        if refreshed:
+            break
+        time.sleep(0.01)
+    assert refreshed == ["second"]
+
+    provider.ttl = 60
+    inner.title = "third"
+    provider.invalidate()
+    assert provider.get_items(filters)[0].title == "third"
+    assert provider.get_items(filters)[0].title == "third"
+    assert inner.calls == 3
+
+
+def test_cache_offline(tmp_path):
+    cache_path = str(tmp_path / "cache")
+    CachedContextProvider("fake", CountingProvider, cache_path, ttl=60).get_items(dict(project="a"))
+
+    def unreachable():
+        raise AssertionError("offline provider should not connect")
+    provider = CachedContextProvider("fake", unreachable, cache_path, ttl=0, offline=True)
+    folder = ContextFolder(ContextFolderConfig("fake", "{title}", dict(project="a")), str(tmp_path / "f"),
+                           dict(fake=provider), NoteType.PROJECT)
+    folder.sync()
+    assert [n.body.title for n in folder.notes if n.flagged] == ["first"]
+    with pytest.raises(ContextProviderOffline):
+        provider.get_items(dict(project="b"))
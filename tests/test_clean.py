@@ -0,0 +1,33 @@
+#!/usr/bin/env
+
+from notebox.clean import clean_folders, MAX_EMPTY_BODY_SIZE, HEAD_SIZE
+from notebox.note import NoteBody, NoteType, Link, LINKS_HEADER
+from notebox.note_folder import NoteFolder
+
+
+def test_clean_removes_only_empty_notes(tmp_path):
+    notes = {
+        "empty": NoteBody(title="Empty", extra_attributes=dict(author="Someone")).to_string(),
+        "empty_footer": f"---\ntitle: Empty footer\n---\n\n---\n\n{LINKS_HEADER}\n",
+        "content": NoteBody(title="Content", content="Something").to_string(),
+        "linked": NoteBody(title="Linked", links=[Link("Content", "./content.md")]).to_string(),
+        "large": NoteBody(title="Large", content="x" * MAX_EMPTY_BODY_SIZE).to_string(),
+        "long_front_matter": NoteBody(title="Long front matter", extra_attributes=dict(summary="x" * HEAD_SIZE)).to_string(),
+    }
+    for uid, raw in notes.items():
+        (tmp_path / f"{uid}.md").write_text(raw)
+    folder = NoteFolder(str(tmp_path), NoteType.ZETTEL, defer=True)
+
+    [result] = clean_folders([folder], dry_run=True)
+    assert sorted(result.empty) == ["empty", "empty_footer", "long_front_matter"]
+    # Only the start of the large note is read
+    assert (result.scanned, result.candidates) == (6, 5)
+    assert len(folder.notes) == 6
+
+    # Notes in memory which aren't empty don't have to be read
+    [result] = clean_folders([folder], dry_run=True)
+    assert (result.scanned, result.candidates) == (6, 3)
+
+    clean_folders([folder])
+    assert sorted(folder.uids) == ["content", "large", "linked"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["content.md", "large.md", "linked.md"]
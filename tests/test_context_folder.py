@@ -0,0 +1,30 @@
+#!/usr/bin/env
+
+from notebox.config import ContextFolderConfig
+from notebox.context_folder import ContextFolder
+from notebox.context_provider.base import ContextProvider, ContextProviderItem
+from notebox.note import NoteType
+
+
+class PayloadProvider(ContextProvider):
+
+    def __init__(self):
+        self.items = [ContextProviderItem(title="Task", uid="1", service="fake", raw=dict(priority=4))]
+
+    def get_items(self, filters):
+        return self.items
+
+
+def test_context_folder_can_drop_raw_payloads(tmp_path):
+    provider = PayloadProvider()
+    config = ContextFolderConfig("fake", "{title}", dict())
+    folder = ContextFolder(config, str(tmp_path / "projects"), dict(fake=provider), NoteType.PROJECT, keep_raw=False)
+    folder.sync()
+    [note] = [n for n in folder.notes if n.flagged]
+    assert (note.provider_item.title, note.provider_item.raw) == ("Task", None)
+    # The items of the provider keep their payloads
+    assert provider.items[0].raw == dict(priority=4)
+
+    kept = ContextFolder(config, str(tmp_path / "kept"), dict(fake=provider), NoteType.PROJECT)
+    kept.sync()
+    assert kept.notes[0].provider_item is provider.items[0]
@@ -0,0 +1,76 @@
+#!/usr/bin/env
+
+from datetime import datetime, timedelta
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from notebox.context_provider.gcal import ContextProviderGcal
+
+
+class StubRequest:
+
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+class StubCalendar:
+    '''Stands in for the events resource of the discovery client, answering list requests from queued pages
+    '''
+
+    def __init__(self):
+        self.pages = []
+        self.requests = []
+
+    def events(self):
+        return self
+
+    def list(self, **kwargs):
+        self.requests.append(kwargs)
+        return StubRequest(self.pages.pop(0))
+
+
+class StubbedGcal(ContextProviderGcal):
+
+    def _connect(self, creds_fp):
+        return StubCalendar()
+
+
+def event(uid, start, end, all_day=False, **kwargs):
+    key = 'date' if all_day else 'dateTime'
+    return dict(id=uid, summary=f" Event {uid} ", start={key: start.isoformat()}, end={key: end.isoformat()}, **kwargs)
+
+
+def test_gcal_windowed_paginated_incremental():
+    provider = StubbedGcal(dict(username="me", credentials_json_path="creds.json", days_back=1, days_forward=2))
+    stub = provider.calendar
+    today = datetime.now().astimezone().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    stub.pages = [
+        dict(items=[event("a", today + timedelta(hours=9), today + timedelta(hours=10))], nextPageToken="p2"),
+        dict(items=[event("b", today.date(), (today + timedelta(days=1)).date(), all_day=True)], nextSyncToken="s1"),
+    ]
+    items = provider.get_items(dict(calendar="work"))
+    assert [(i.uid, i.title) for i in items] == [("b", "Event b"), ("a", "Event a")]
+    assert stub.requests[0]["timeMin"] == (today - timedelta(days=1)).isoformat()
+    assert stub.requests[1]["pageToken"] == "p2"
+
+    stub.pages = [dict(items=[
+        dict(id="a", status="cancelled"),
+        event("c", today + timedelta(days=1, hours=9), today + timedelta(days=1, hours=10)),
+        event("far", today + timedelta(days=30), today + timedelta(days=30, hours=1)),
+    ], nextSyncToken="s2")]
+    assert [i.uid for i in provider.get_items(dict(calendar="work"))] == ["b", "c"]
+    assert stub.requests[-1]["syncToken"] == "s1" and "timeMin" not in stub.requests[-1]
+
+    stub.pages = [
+        HttpError(httplib2.Response(dict(status=410)), b"Gone"),
+        dict(items=[event("d", today + timedelta(hours=12), today + timedelta(hours=13))], nextSyncToken="s3"),
+    ]
+    assert [i.uid for i in provider.get_items(dict(calendar="work"))] == ["d"]
+    assert provider.sync_tokens["work"] == "s3"
@@ -0,0 +1,74 @@
+#!/usr/bin/env
+
+import os
+
+from notebox.link_graph import LinkGraph
+from notebox.migrate import migrate_layout
+from notebox.note import NoteBody, NoteType, Link
+from notebox.note_folder import NoteFolder, NoteLayout
+
+
+def test_layout_subdir():
+    assert NoteLayout.SHARDED.subdir("20261018123456") == os.path.join("2026", "10")
+    assert NoteLayout.SHARDED.subdir("2026-10-18") == os.path.join("2026", "10")
+    assert NoteLayout.SHARDED.subdir("todoist-123") == ""
+    assert NoteLayout.FLAT.subdir("20261018123456") == ""
+
+
+def test_sharded_folder_reads_and_creates_notes_in_shards(tmp_path):
+    (tmp_path / "2026" / "09").mkdir(parents=True)
+    (tmp_path / "2026" / "09" / "20260901000000.md").write_text(NoteBody(title="Sharded").to_string())
+    (tmp_path / "20260902000000.md").write_text(NoteBody(title="Flat").to_string())
+    folder = NoteFolder(str(tmp_path), NoteType.ZETTEL, layout=NoteLayout.SHARDED)
+    assert sorted(folder.uids) == ["20260901000000", "20260902000000"]
+    assert folder.notes_by_id["20260901000000"].filepath == str(tmp_path / "2026" / "09" / "20260901000000.md")
+
+    note = folder.create("New", "20261018000000")
+    assert os.path.isfile(tmp_path / "2026" / "10" / "20261018000000.md")
+
+    folder.pull()
+    assert folder.notes_by_id["20261018000000"] is note
+
+
+def test_migrate_layout_moves_notes_and_repairs_links(tmp_path):
+    zettel_path = tmp_path / "zettel"
+    source_path = tmp_path / "source"
+    zettel_path.mkdir()
+    source_path.mkdir()
+    (source_path / "todoist-1.md").write_text(NoteBody(
+        title="Source",
+        references=[Link("First", "../zettel/20260901000000.md")],
+    ).to_string())
+    (zettel_path / "20260901000000.md").write_text(NoteBody(
+        title="First",
+        links=[Link("Second", "./20261001000000.md")],
+        references=[Link("Source", "../source/todoist-1.md")],
+    ).to_string())
+    (zettel_path / "20261001000000.md").write_text(NoteBody(
+        title="Second",
+        links=[Link("First", "./20260901000000.md")],
+    ).to_string())
+    zettel = NoteFolder(str(zettel_path), NoteType.ZETTEL, layout=NoteLayout.SHARDED)
+    source = NoteFolder(str(source_path), NoteType.SOURCE, layout=NoteLayout.SHARDED)
+    link_graph = LinkGraph([zettel, source])
+
+    result = migrate_layout([zettel, source], link_graph)
+    assert (result.moved, result.rewritten) == (2, 3)
+    first = zettel.notes_by_id["20260901000000"]
+    assert first.filepath == str(zettel_path / "2026" / "09" / "20260901000000.md")
+    assert [l.path for l in first.body.links] == ["../10/20261001000000.md"]
+    assert [l.path for l in first.body.references] == ["../../../source/todoist-1.md"]
+    assert [l.path for l in source.notes_by_id["todoist-1"].body.references] == ["../zettel/2026/09/20260901000000.md"]
+    assert [n.body.title for n in link_graph.backlinks(first)] == ["Source", "Second"]
+
+    # Files are read back as they were written
+    zettel = NoteFolder(str(zettel_path), NoteType.ZETTEL, layout=NoteLayout.SHARDED)
+    assert zettel.notes_by_id["20261001000000"].body.links[0].path == "../09/20260901000000.md"
+
+    # And migrated back again
+    zettel.layout = NoteLayout.FLAT
+    source.layout = NoteLayout.FLAT
+    result = migrate_layout([zettel, source], LinkGraph([zettel, source]))
+    assert (result.moved, result.rewritten) == (2, 3)
+    assert sorted(p.name for p in zettel_path.iterdir()) == ["20260901000000.md", "20261001000000.md"]
+    assert source.notes_by_id["todoist-1"].body.references[0].path == "../zettel/20260901000000.md"
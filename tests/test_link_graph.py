@@ -0,0 +1,62 @@
+#!/usr/bin/env
+
+import os
+
+from notebox.note import NoteBody, NoteType, Link
+from notebox.note_folder import NoteFolder
+from notebox.link_graph import LinkGraph
+
+
+def test_link_graph(tmp_path, write_note):
+    zettel_path = tmp_path / "zettel"
+    source_path = tmp_path / "source"
+    zettel_path.mkdir()
+    source_path.mkdir()
+    write_note(zettel_path, "1", NoteBody(title="One", links=[Link("Two", "./2.md")], references=[Link("Book", "../source/b.md")]))
+    write_note(zettel_path, "2", NoteBody(title="Two", links=[Link("One", "./1.md"), Link("Three", "./3.md")]))
+    write_note(zettel_path, "3", NoteBody(title="Three"))
+    write_note(source_path, "b", NoteBody(title="Book", references=[Link("One", "../zettel/1.md")]))
+    zettel = NoteFolder(str(zettel_path), NoteType.ZETTEL)
+    source = NoteFolder(str(source_path), NoteType.SOURCE)
+    graph = LinkGraph([zettel, source])
+
+    one, two, three = [zettel.notes_by_id[uid] for uid in ["1", "2", "3"]]
+    book = source.notes_by_id["b"]
+    assert graph.backlinks(one) == [book, two]
+    assert graph.backlinks(three) == [two]
+    assert graph.neighbours(three, 1) == [(two, 1)]
+    assert [(n.uid, d) for n, d in graph.neighbours(three)] == [("2", 1), ("1", 2)]
+
+    three.body.links.append(Link("Book", "../source/b.md"))
+    zettel.update(three)
+    assert graph.backlinks(book) == [one, three]
+
+    os.remove(one.filepath)
+    zettel.pull()
+    assert graph.backlinks(book) == [three]
+    assert graph.backlinks(two) == []
+
+
+def test_link_graph_keeps_changes_made_while_building(tmp_path, write_note):
+    zettel_path = tmp_path / "zettel"
+    source_path = tmp_path / "source"
+    zettel_path.mkdir()
+    source_path.mkdir()
+    write_note(zettel_path, "1", NoteBody(title="One"))
+    write_note(source_path, "b", NoteBody(title="Book"))
+    zettel = NoteFolder(str(zettel_path), NoteType.ZETTEL)
+    source = NoteFolder(str(source_path), NoteType.SOURCE)
+    graph = LinkGraph([zettel, source])
+    one = zettel.notes_by_id["1"]
+    book = source.notes_by_id["b"]
+
+    # The zettel folder is already read into the graph by the time the book is
+    update = graph.update
+    def update_and_edit(note):
+        if note is book and one.body.links == []:
+            one.body.links.append(Link("Book", "../source/b.md"))
+            zettel.update(one)
+        update(note)
+    graph.update = update_and_edit
+
+    assert graph.backlinks(book) == [one]
@@ -0,0 +1,29 @@
+#!/usr/bin/env
+
+import os
+
+from notebox.note import NoteBody, NoteType
+from notebox.note_folder import NoteFolder
+from notebox.matcher import TitleMatcher
+
+
+def test_title_matcher(tmp_path):
+    for uid, title in [("1", "Python memory model"), ("2", "Memory in Python"), ("3", "Rust"), ("4", "Pythonic code")]:
+        path = os.path.join(tmp_path, uid + ".md")
+        with open(path, 'w') as f:
+            f.write(NoteBody(title=title).to_string())
+        os.utime(path, ns=(int(uid) * 10**9, int(uid) * 10**9))
+    folder = NoteFolder(str(tmp_path), NoteType.ZETTEL)
+    matcher = TitleMatcher(folder)
+
+    assert [n.uid for n in matcher.match("pyth")] == ["4", "1", "2"]
+    assert [n.uid for n in matcher.match("pyth mem")] == ["2", "1"]
+    assert [n.uid for n in matcher.match("pyth", limit=1)] == ["4"]
+
+    folder.notes_by_id["2"].flagged = True
+    assert [n.uid for n in matcher.match("python")] == ["2", "4", "1"]
+
+    folder.set_title(folder.notes_by_id["3"], "Rust and Python")
+    assert [n.uid for n in matcher.match("python and")] == ["3"]
+    folder.forget_note("3")
+    assert matcher.match("rust") == []
@@ -75,3 +75,42 @@ def test_md_to_note(markdown,note):
 def test_note_to_md(markdown,note):
     assert NoteBody.to_string(note) == markdown
     
+
+
+note_horizontal_rule = NoteBody(
+    title="Note: with a colon",
+    extra_attributes=dict(tags=["a", "b"], year=2020),
+    content="Before\n\n---\n\nAfter a---b",
+    links=[Link("Link 1", "./98765.md")],
+)
+
+markdown_horizontal_rule = """---
+title: 'Note: with a colon'
+tags:
+- a
+- b
+year: 2020
+---
+
+Before
+
+---
+
+After a---b
+
+---
+
+**Links**
+
+- [Link 1](./98765.md)"""
+
+
+def test_horizontal_rule_round_trip():
+    assert NoteBody.from_string(markdown_horizontal_rule) == note_horizontal_rule
+    assert note_horizontal_rule.to_string() == markdown_horizontal_rule
+
+
+def test_trailing_horizontal_rule_is_not_a_footer():
+    body = NoteBody.from_string("---\ntitle: Note Title\n---\n\nHello\n\n---\n\nWorld")
+    assert body.content == "Hello\n\n---\n\nWorld"
+    assert body.links == [] and body.references == []
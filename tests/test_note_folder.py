@@ -0,0 +1,128 @@
+#!/usr/bin/env
+
+import os
+
+import pytest
+
+from notebox.note import NoteBody, LazyNoteBody, NoteType, Link
+from notebox.note_folder import NoteFolder
+from notebox.note_index import NoteIndex
+
+
+@pytest.fixture
+def folder_path(tmp_path, write_note):
+    path = tmp_path / "zettel"
+    path.mkdir()
+    write_note(path, "1", NoteBody(title="One", content="First", links=[Link("Two", "./2.md")]))
+    write_note(path, "2", NoteBody(title="Two", content="Second"))
+    return str(path)
+
+
+def test_indexed_pull_reuses_unchanged_notes(folder_path, tmp_path):
+    index = NoteIndex(str(tmp_path / "index.sqlite"))
+    NoteFolder(folder_path, NoteType.ZETTEL, index=index)
+
+    folder = NoteFolder(folder_path, NoteType.ZETTEL, index=index)
+    note = folder.notes_by_id["1"]
+    assert isinstance(note.body, LazyNoteBody)
+    assert not note.body.is_loaded
+    assert note.body.title == "One"
+    assert note.body.links == [Link("Two", "./2.md")]
+    assert note.body.content == "First"
+
+
+def test_indexed_pull_reparses_changed_and_drops_removed_notes(folder_path, tmp_path, write_note):
+    index = NoteIndex(str(tmp_path / "index.sqlite"))
+    NoteFolder(folder_path, NoteType.ZETTEL, index=index)
+
+    write_note(folder_path, "1", NoteBody(title="One, changed", content="First, but longer"))
+    os.remove(os.path.join(folder_path, "2.md"))
+
+    folder = NoteFolder(folder_path, NoteType.ZETTEL, index=index)
+    assert folder.titles == ["One, changed"]
+    assert set(index.get_folder(folder.path).keys()) == {"1"}
+
+
+def test_lazy_pull_reads_front_matter_only(folder_path):
+    folder = NoteFolder(folder_path, NoteType.ZETTEL, lazy=True)
+    note = folder.notes_by_id["1"]
+    assert note.body.title == "One"
+    assert not note.body.is_loaded
+    assert note.body.links == [Link("Two", "./2.md")]
+    assert note.body == NoteBody(title="One", content="First", links=[Link("Two", "./2.md")])
+
+
+def test_incremental_pull(folder_path, write_note):
+    folder = NoteFolder(folder_path, NoteType.ZETTEL)
+    unchanged = folder.notes_by_id["1"]
+    changed = folder.notes_by_id["2"]
+
+    write_note(folder_path, "2", NoteBody(title="Two, changed", content="Second, but longer"))
+    write_note(folder_path, "3", NoteBody(title="Three"))
+    os.remove(os.path.join(folder_path, "1.md"))
+    folder.pull()
+
+    assert sorted(folder.uids) == ["2", "3"]
+    assert folder.notes_by_id["2"] is changed
+    assert changed.body.title == "Two, changed"
+
+    new = folder.notes_by_id["3"]
+    write_note(folder_path, "1", NoteBody(title="One"))
+    folder.pull()
+    assert folder.notes_by_id["1"] is not unchanged
+    assert folder.notes_by_id["3"] is new
+
+
+def test_indexes_follow_changes(folder_path):
+    folder = NoteFolder(folder_path, NoteType.ZETTEL)
+    one = folder.notes_by_id["1"]
+
+    duplicate = folder.create("One", "3")
+    assert folder.notes_with_title("One") == [one, duplicate]
+    assert folder.notes_by_id["3"] is duplicate
+
+    folder.set_title(duplicate, "Three")
+    assert folder.notes_with_title("One") == [one]
+    assert folder.notes_with_title("Three") == [duplicate]
+
+    folder.forget_note("1")
+    assert "One" not in folder.notes_by_title
+    assert sorted(folder.uids) == ["2", "3"]
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_push_only_writes_changed_notes(folder_path, lazy):
+    folder = NoteFolder(folder_path, NoteType.ZETTEL, lazy=lazy)
+    one = folder.notes_by_id["1"]
+    two = folder.notes_by_id["2"]
+    assert not one.push()
+    assert two.body.content == "Second"
+    assert not two.push()
+
+    two.body.links.append(Link("One", "./1.md"))
+    assert two.push()
+    assert not two.push()
+    assert NoteBody.from_file(two.filepath).links == [Link("One", "./1.md")]
+    assert sorted(os.listdir(folder_path)) == ["1.md", "2.md"]
+
+
+def test_push_writes_nested_attributes_changed_in_place(tmp_path, write_note):
+    write_note(tmp_path, "1", NoteBody(title="One", extra_attributes=dict(comments=["First"])))
+    folder = NoteFolder(str(tmp_path), NoteType.ZETTEL, lazy=True)
+    note = folder.notes_by_id["1"]
+    assert not note.push()
+
+    note.body.extra_attributes["comments"].append("Second")
+    assert note.push()
+    assert NoteBody.from_file(note.filepath).extra_attributes["comments"] == ["First", "Second"]
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_push_leaves_non_canonical_files_alone(tmp_path, lazy):
+    raw = '---\ntitle: Foo\n---\n\nHello\n'
+    (tmp_path / "1.md").write_text(raw)
+    folder = NoteFolder(str(tmp_path), NoteType.ZETTEL, lazy=lazy)
+    note = folder.notes_by_id["1"]
+    assert note.body.content == "Hello"
+    assert not note.push()
+    assert (tmp_path / "1.md").read_text() == raw
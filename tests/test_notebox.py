@@ -0,0 +1,60 @@
+#!/usr/bin/env
+
+import pytest
+
+from notebox.note import NoteBody
+from notebox.notebox import Notebox
+from notebox.search import SearchQuery
+
+
+def test_notebox_defers_providers_and_folders(tmp_path, notebox_config):
+    (tmp_path / "zettel").mkdir()
+    (tmp_path / "zettel" / "1.md").write_text(NoteBody(title="Deferred").to_string())
+
+    notebox = Notebox(notebox_config(), sync=False)
+    assert not notebox.context_providers["todoist"].connected
+    assert not any(folder.loaded for folder in notebox.folders)
+
+    assert [n.body.title for n in notebox.zettel.notes] == ["Deferred"]
+    assert notebox.zettel.loaded and not notebox.source.loaded
+
+
+def test_link_many_writes_every_note_once(tmp_path, notebox_config, record_stats):
+    for folder in ["zettel", "source"]:
+        (tmp_path / folder).mkdir()
+    for n in range(5):
+        (tmp_path / "zettel" / f"{n}.md").write_text(NoteBody(title=f"Zettel {n}").to_string())
+    (tmp_path / "source" / "s.md").write_text(NoteBody(title="Book").to_string())
+    notebox = Notebox(notebox_config(), sync=False)
+    note = notebox.zettel.notes_by_id["0"]
+    others = [notebox.zettel.notes_by_id[str(n)] for n in range(1, 5)] + [notebox.source.notes_by_id["s"]]
+
+    with record_stats() as stats:
+        assert notebox.link_many(note, others + others[:1]) == 10
+    assert stats.counters["Note.push.written"] == 6
+
+    assert [l.title for l in note.body.links] == ["Zettel 1", "Zettel 2", "Zettel 3", "Zettel 4"]
+    assert [l.path for l in note.body.references] == ["../source/s.md"]
+    assert [l.title for l in others[-1].body.links] == ["Zettel 0"]
+    assert [n.body.title for n in notebox.link_graph.backlinks(note)] == ["Book", "Zettel 1", "Zettel 2", "Zettel 3", "Zettel 4"]
+    assert notebox.link_many(note, others) == 0
+
+
+def test_link_many_uses_the_notes_of_folders(tmp_path, notebox_config, write_note):
+    (tmp_path / "zettel").mkdir()
+    write_note(tmp_path / "zettel", "1", NoteBody(title="Inverted index"))
+    write_note(tmp_path / "zettel", "2", NoteBody(title="Books"))
+    config = notebox_config(index_path=str(tmp_path / "index.sqlite"))
+    Notebox(config, sync=False).zettel.ensure_loaded()
+
+    notebox = Notebox(config, sync=False)
+    [hit] = notebox.search_index.search_files(SearchQuery.parse("inverted"), 10)
+    assert not notebox.zettel.loaded
+    books = notebox.zettel.notes_by_id["2"]
+    assert notebox.link_many(books, [hit.note]) == 2
+
+    [one] = notebox.zettel.notes_with_title("Inverted index")
+    assert one is notebox.zettel.notes_by_id["1"]
+    assert [l.title for l in one.body.links] == ["Books"]
+    with pytest.raises(ValueError):
+        notebox.zettel.update(hit.note)
@@ -0,0 +1,42 @@
+#!/usr/bin/env
+
+from notebox.link_graph import LinkGraph
+from notebox.note import NoteBody, NoteType, Link
+from notebox.note_folder import NoteFolder
+from notebox.relink import TitlePropagator
+
+
+def make_folders(tmp_path):
+    for folder in ["zettel", "source"]:
+        (tmp_path / folder).mkdir()
+    (tmp_path / "source" / "s.md").write_text(NoteBody(title="Old title").to_string())
+    for n in range(3):
+        references = [Link("Old title", "../source/s.md")] if n < 2 else []
+        (tmp_path / "zettel" / f"{n}.md").write_text(NoteBody(title=f"Zettel {n}", references=references).to_string())
+    return NoteFolder(str(tmp_path / "zettel"), NoteType.ZETTEL), NoteFolder(str(tmp_path / "source"), NoteType.SOURCE)
+
+
+def test_renames_are_propagated_to_referrers_only(tmp_path, record_stats):
+    zettel, source = make_folders(tmp_path)
+    propagator = TitlePropagator(LinkGraph([zettel, source]), [zettel, source])
+
+    source.set_title(source.notes_by_id["s"], "New title")
+    source.push()
+    with record_stats() as stats:
+        assert propagator.flush() == 2
+    assert stats.counters["Note.push.written"] == 2
+
+    zettel.pull()
+    assert [n.body.references[0].title for n in zettel.notes if n.body.references] == ["New title", "New title"]
+    assert propagator.flush() == 0
+
+
+def test_relink_repairs_stale_titles(tmp_path):
+    zettel, source = make_folders(tmp_path)
+    (tmp_path / "source" / "s.md").write_text(NoteBody(title="Edited elsewhere").to_string())
+    source = NoteFolder(str(tmp_path / "source"), NoteType.SOURCE)
+    propagator = TitlePropagator(LinkGraph([zettel, source]), [zettel, source])
+
+    assert propagator.relink() == 2
+    assert propagator.relink() == 0
+    assert NoteBody.from_file(str(tmp_path / "zettel" / "0.md")).references == [Link("Edited elsewhere", "../source/s.md")]
@@ -0,0 +1,28 @@
+#!/usr/bin/env
+
+import os
+import time
+
+from prompt_toolkit.document import Document
+
+from notebox.note import NoteBody, NoteType
+from notebox.note_folder import NoteFolder
+from notebox.repl import BackgroundRefresher, Command, NoteCompleter
+
+
+def test_completion_does_not_wait_for_refresh(tmp_path):
+    with open(os.path.join(tmp_path, "1.md"), 'w') as f:
+        f.write(NoteBody(title="Python memory model").to_string())
+    folder = NoteFolder(str(tmp_path), NoteType.ZETTEL)
+    refresher = BackgroundRefresher()
+    completer = NoteCompleter([Command("zettel", None, folder)], refresher)
+
+    def complete(text):
+        return [c.text for c in completer.get_completions(Document(text), None)]
+
+    assert complete("zettel pyth") == []
+    deadline = time.monotonic() + 5
+    while refresher.busy and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert complete("zettel pyth") == ["1"]
+    assert complete("zet") == ["zettel"]
@@ -0,0 +1,88 @@
+#!/usr/bin/env
+
+import pytest
+
+from notebox import search
+from notebox.note import NoteBody, NoteType
+from notebox.note_folder import NoteFolder
+from notebox.note_index import NoteIndex
+from notebox.search import SearchIndex, SearchQuery
+
+
+def test_query_parsing():
+    query = SearchQuery.parse('memory "inverted index" Python')
+    assert query.terms == ["memory", "inverted", "index", "python"]
+    assert query.phrases == [["inverted", "index"]]
+
+
+def test_search(tmp_path, write_note):
+    write_note(tmp_path, "1", NoteBody(title="Inverted index", content="An index maps words to notes. Index index."))
+    write_note(tmp_path, "2", NoteBody(title="Books", extra_attributes=dict(author="Index Author"), content="The index of a book is inverted."))
+    write_note(tmp_path, "3", NoteBody(title="Unrelated", content="Nothing to see"))
+    folder = NoteFolder(str(tmp_path), NoteType.ZETTEL)
+    index = SearchIndex([folder])
+
+    cold = [hit.note.uid for hit in index.search("index")]
+    assert sorted(cold) == ["1", "2"]
+
+    index.built.wait(5)
+    assert [hit.note.uid for hit in index.search("index")] == ["1", "2"]
+    assert [hit.note.uid for hit in index.search('"inverted index"')] == ["1"]
+    assert [hit.note.uid for hit in index.search("author")] == ["2"]
+    assert index.search("index nothing") == []
+
+    write_note(tmp_path, "3", NoteBody(title="Related", content="An inverted index after all"))
+    folder.pull()
+    assert sorted(hit.note.uid for hit in index.search('"inverted index"')) == ["1", "3"]
+    folder.forget_note("1")
+    assert [hit.note.uid for hit in index.search('"inverted index"')] == ["3"]
+
+
+class CompletedRipgrep:
+
+    def __init__(self, returncode, stdout="", stderr=""):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+
+
+@pytest.mark.parametrize("returncode, stdout, expected", [
+    # Only the files ripgrep lists are read
+    (0, "{path}/1.md\n", ["1"]),
+    (1, "", []),
+    # On an error, which ripgrep writes to stderr, all files are scanned instead
+    (2, "", ["1", "2"]),
+])
+def test_cold_search_uses_ripgrep(tmp_path, monkeypatch, returncode, stdout, expected, write_note):
+    write_note(tmp_path, "1", NoteBody(title="Index", content="index"))
+    write_note(tmp_path, "2", NoteBody(title="Also an index"))
+    folder = NoteFolder(str(tmp_path), NoteType.ZETTEL)
+    calls = []
+    def run(command, **kwargs):
+        calls.append(command)
+        return CompletedRipgrep(returncode, stdout.format(path=tmp_path), "rg: something went wrong" if returncode == 2 else "")
+    monkeypatch.setattr(search.shutil, "which", lambda name: "/usr/bin/rg")
+    monkeypatch.setattr(search.subprocess, "run", run)
+
+    index = SearchIndex([folder])
+    # Keeps the index from being built in the background, so every search is a cold one
+    index.started = True
+    assert sorted(hit.note.uid for hit in index.search("index")) == expected
+    assert calls[0][-2:] == ["index", str(tmp_path)]
+
+
+def test_cold_search_leaves_unloaded_folders_alone(tmp_path, write_note):
+    note_index = NoteIndex(str(tmp_path / "index.sqlite"))
+    folder_path = tmp_path / "zettel"
+    folder_path.mkdir()
+    write_note(folder_path, "1", NoteBody(title="Inverted index", content="Words to notes"))
+    write_note(folder_path, "2", NoteBody(title="Books", content="An index"))
+    NoteFolder(str(folder_path), NoteType.ZETTEL, index=note_index)
+
+    folder = NoteFolder(str(folder_path), NoteType.ZETTEL, index=note_index, defer=True)
+    index = SearchIndex([folder])
+    index.started = True
+    # Only titles and extra attributes are in the persistent index
+    assert [hit.note.uid for hit in index.search("index")] == ["1"]
+    assert [hit.note.body.content for hit in index.search("inverted")] == ["Words to notes"]
+    assert not folder.loaded
@@ -0,0 +1,41 @@
+#!/usr/bin/env
+
+import os
+
+import pytest
+
+from notebox.note import NoteBody, Link
+from notebox.notebox import Notebox
+from notebox.snapshot import SNAPSHOT_HEADER, read_snapshot
+
+
+@pytest.fixture
+def make_notebox(tmp_path, notebox_config):
+    return lambda: Notebox(notebox_config(snapshot_path=str(tmp_path / "snapshot.bin")), sync=False)
+
+
+def test_snapshot_is_validated_against_files(tmp_path, make_notebox, record_stats):
+    (tmp_path / "zettel").mkdir()
+    for n in range(3):
+        body = NoteBody(title=f"Zettel {n}", content=f"Content {n}", links=[Link("Zettel 0", "./0.md")])
+        (tmp_path / "zettel" / f"{n}.md").write_text(body.to_string())
+    assert make_notebox().snapshot() == 3
+
+    (tmp_path / "zettel" / "1.md").write_text(NoteBody(title="Changed").to_string())
+    os.remove(tmp_path / "zettel" / "2.md")
+
+    with record_stats() as stats:
+        notebox = make_notebox()
+        titles = sorted(n.body.title for n in notebox.zettel.notes)
+        notebox.zettel.push()
+    assert titles == ["Changed", "Zettel 0"]
+    assert stats.histograms["Note.load"].count == 1
+    assert "Note.push.written" not in stats.counters
+    assert notebox.zettel.notes_by_id["0"].body.content == "Content 0"
+
+
+def test_snapshot_of_other_version_is_ignored(tmp_path):
+    path = tmp_path / "snapshot.bin"
+    path.write_bytes(SNAPSHOT_HEADER.pack(b"NOTEBOX-SNAPSHOT", 0) + b"data")
+    assert read_snapshot(str(path)) is None
+    assert read_snapshot(str(tmp_path / "missing.bin")) is None
@@ -0,0 +1,29 @@
+#!/usr/bin/env
+
+from notebox.note import NoteBody, NoteType
+from notebox.note_folder import NoteFolder
+from notebox.stats import Histogram, stats
+
+
+def test_stats_record_only_while_enabled(tmp_path, record_stats):
+    (tmp_path / "1.md").write_text(NoteBody(title="Timed").to_string())
+    stats.reset()
+    NoteFolder(str(tmp_path), NoteType.ZETTEL)
+    assert stats.histograms == dict()
+
+    with record_stats():
+        folder = NoteFolder(str(tmp_path), NoteType.ZETTEL)
+        folder.notes[0].body.content = "Changed"
+        folder.push()
+    assert stats.histograms["NoteFolder.pull"].count == 1
+    assert stats.histograms["Note.load"].count == 1
+    assert stats.counters["Note.push.written"] == 1
+    assert "Note.push" in stats.report()
+
+
+def test_histogram_percentiles():
+    histogram = Histogram()
+    for seconds in [0.001] * 90 + [0.1] * 10:
+        histogram.record(seconds)
+    assert histogram.percentile(50) == 1024 / 1e6
+    assert histogram.percentile(99) == 0.1
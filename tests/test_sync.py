@@ -0,0 +1,75 @@
+#!/usr/bin/env
+
+import os
+import sys
+import time
+import threading
+import subprocess
+
+from notebox.config import ContextFolderConfig
+from notebox.context_folder import ContextFolder
+from notebox.context_provider.base import ContextProvider, ContextProviderItem
+from notebox.note import NoteType
+from notebox.sync import SyncScheduler
+
+
+class FakeProvider(ContextProvider):
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def get_items(self, filters):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("offline")
+        return [ContextProviderItem(title=f"{filters['project']} task", uid=filters['project'], service="fake")]
+
+
+def make_folder(tmp_path, name, providers, provider, project):
+    config = ContextFolderConfig(provider, "{title}", dict(project=project))
+    return ContextFolder(config, str(tmp_path / name), providers, NoteType.PROJECT)
+
+
+def test_sync_runs_providers_concurrently(tmp_path):
+    providers = dict(slow1=FakeProvider(0.3), slow2=FakeProvider(0.3), broken=FakeProvider(fail=True), hung=FakeProvider(5))
+    folders = [
+        make_folder(tmp_path, "a", providers, "slow1", "a"),
+        make_folder(tmp_path, "b", providers, "slow1", "a"),
+        make_folder(tmp_path, "c", providers, "slow2", "c"),
+        make_folder(tmp_path, "d", providers, "broken", "d"),
+        make_folder(tmp_path, "e", providers, "hung", "e"),
+    ]
+
+    start = time.monotonic()
+    errors = SyncScheduler(dict(hung=0.5)).sync(folders)
+    assert time.monotonic() - start < 1.0
+
+    assert providers["slow1"].calls == 1
+    assert set(errors.keys()) == {folders[3], folders[4]}
+    assert [n.body.title for n in folders[0].notes if n.flagged] == ["a task"]
+    assert [n.body.title for n in folders[1].notes if n.flagged] == ["a task"]
+    assert [n.body.title for n in folders[2].notes if n.flagged] == ["c task"]
+    assert folders[3].notes == []
+
+
+def test_hung_provider_does_not_block_exit(tmp_path):
+    script = f"""
+import threading
+from tests.test_sync import FakeProvider, make_folder
+from notebox.sync import SyncScheduler
+
+class HungProvider(FakeProvider):
+    def get_items(self, filters):
+        threading.Event().wait()
+
+folder = make_folder(__import__('pathlib').Path({str(tmp_path)!r}), "hung", dict(hung=HungProvider()), "hung", "h")
+errors = SyncScheduler(dict(hung=0.1)).sync([folder])
+assert folder in errors
+"""
+    result = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.dirname(__file__)), timeout=10)
+    assert result.returncode == 0
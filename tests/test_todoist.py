@@ -0,0 +1,95 @@
+#!/usr/bin/env
+
+import os
+
+from notebox.config import ContextFolderConfig
+from notebox.context_folder import ContextFolder
+from notebox.note import NoteType
+from notebox.context_provider.todoist import ContextProviderTodoist
+
+
+def task(uid, content, project_id=1, labels=(), section_id=None):
+    return dict(id=uid, content=content, project_id=project_id, labels=list(labels), section_id=section_id,
+                checked=0, parent_id=None, priority=1, date_added="2021-01-01T10:00:00Z")
+
+
+def comment(uid, item_id, content, posted):
+    return dict(id=uid, item_id=item_id, content=content, posted=posted)
+
+
+class FakeResponse:
+
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class FakeSyncEndpoint:
+    '''Answers the Todoist sync endpoint with the full state for "*", and with queued deltas afterwards
+    '''
+
+    def __init__(self):
+        self.state = dict(
+            user=dict(email="me@example.com"),
+            projects=[dict(id=1, name="work"), dict(id=2, name="home")],
+            labels=[dict(id=10, name="urgent")],
+            sections=[dict(id=20, name="backlog")],
+            items=[task(100, "Fix ABC-12", labels=[10], section_id=20), task(101, "Groceries", project_id=2)],
+            notes=[comment(1000, 100, "Second", "2021-01-03T10:00:00Z"), comment(1001, 100, "First", "2021-01-02T10:00:00Z")],
+        )
+        self.deltas = []
+        self.sync_tokens = []
+
+    def post(self, url, data):
+        self.sync_tokens.append(data["sync_token"])
+        if data["sync_token"] == "*":
+            return FakeResponse(dict(sync_token="1", full_sync=True, **self.state))
+        delta = self.deltas.pop(0) if self.deltas else dict()
+        return FakeResponse(dict(sync_token=str(len(self.sync_tokens)), full_sync=False, **delta))
+
+
+def test_todoist_shares_syncs_and_syncs_incrementally(tmp_path):
+    endpoint = FakeSyncEndpoint()
+    provider = ContextProviderTodoist(dict(api_key="key", cache=str(tmp_path)), session=endpoint)
+
+    work = provider.get_items(dict(project="work"))
+    home = provider.get_items(dict(project=["home"]))
+    assert endpoint.sync_tokens == ["*"]
+    assert [(i.title, i.tags, i.collection) for i in work] == [("Fix ABC-12", ["urgent", "ABC-12", "backlog"], "work")]
+    assert [i.title for i in home] == ["Groceries"]
+
+    endpoint.deltas.append(dict(items=[task(102, "Laundry", project_id=2), dict(id=101, is_deleted=1)]))
+    provider.invalidate()
+    assert [i.title for i in provider.get_items(dict(project="home"))] == ["Laundry"]
+    assert endpoint.sync_tokens == ["*", "1"]
+
+    restarted = ContextProviderTodoist(dict(api_key="key", cache=str(tmp_path)), session=endpoint)
+    assert endpoint.sync_tokens[-1] == "2"
+    assert sorted(i.title for i in restarted.get_items(dict())) == ["Fix ABC-12", "Laundry"]
+
+
+def test_todoist_comments_are_rendered_into_project_notes(tmp_path):
+    endpoint = FakeSyncEndpoint()
+    provider = ContextProviderTodoist(dict(api_key="key", cache=str(tmp_path / "cache")), session=endpoint)
+    assert [c['content'] for c in provider.get_comments(provider.get_items(dict(project="work"))[0])] == ["First", "Second"]
+
+    config = ContextFolderConfig("todoist", "{title}", dict(), comments=True)
+    folder = ContextFolder(config, str(tmp_path / "projects"), dict(todoist=provider), NoteType.PROJECT)
+    folder.sync()
+    notes = {n.body.title: n for n in folder.notes}
+    assert notes["Fix ABC-12"].body.extra_attributes["comments"] == ["First", "Second"]
+    assert "comments" not in notes["Groceries"].body.extra_attributes
+
+    filepath = notes["Fix ABC-12"].filepath
+    os.utime(filepath, ns=(0, 0))
+    folder.sync()
+    assert os.stat(filepath).st_mtime_ns == 0
+
+    endpoint.deltas.append(dict(notes=[comment(1002, 100, "Third", "2021-01-04T10:00:00Z")]))
+    provider.invalidate()
+    folder.sync()
+    folder.pull()
+    assert os.stat(filepath).st_mtime_ns != 0
+    assert folder.notes_by_id[notes["Fix ABC-12"].uid].body.extra_attributes["comments"] == ["First", "Second", "Third"]
@@ -0,0 +1,109 @@
+#!/usr/bin/env
+
+import os
+import time
+
+import pytest
+
+from notebox.note import NoteBody, NoteType
+from notebox.note_folder import NoteFolder, NoteLayout
+from notebox.watcher import InotifyFolderWatcher, PollingFolderWatcher, create_watcher
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def inotify_watcher(folders):
+    try:
+        return InotifyFolderWatcher(folders)
+    except (OSError, AttributeError):
+        pytest.skip("inotify is not available")
+
+
+@pytest.mark.parametrize("make_watcher", [
+    lambda folders: create_watcher(folders),
+    inotify_watcher,
+    lambda folders: PollingFolderWatcher(folders, interval=0.05),
+])
+def test_watcher_applies_changes(tmp_path, make_watcher):
+    folder = NoteFolder(str(tmp_path), NoteType.ZETTEL)
+    watcher = make_watcher([folder])
+    watcher.start()
+    try:
+        assert folder.watched
+        path = os.path.join(folder.path, "1.md")
+        with open(path, 'w') as f:
+            f.write(NoteBody(title="One").to_string())
+        assert wait_for(lambda: folder.titles == ["One"])
+
+        note = folder.notes[0]
+        with open(path, 'w') as f:
+            f.write(NoteBody(title="One, renamed").to_string())
+        assert wait_for(lambda: note.body.title == "One, renamed")
+        assert folder.notes[0] is note
+
+        os.rename(path, os.path.join(folder.path, "2.md"))
+        assert wait_for(lambda: folder.uids == ["2"])
+
+        os.remove(os.path.join(folder.path, "2.md"))
+        assert wait_for(lambda: folder.notes == [])
+    finally:
+        watcher.stop()
+    assert not folder.watched
+
+
+@pytest.mark.parametrize("make_watcher", [
+    lambda folders: create_watcher(folders),
+    inotify_watcher,
+    lambda folders: PollingFolderWatcher(folders, interval=0.05),
+])
+def test_watcher_applies_changes_in_shards(tmp_path, make_watcher):
+    folder = NoteFolder(str(tmp_path), NoteType.ZETTEL, layout=NoteLayout.SHARDED)
+    watcher = make_watcher([folder])
+    watcher.start()
+    try:
+        shard = os.path.join(folder.path, "2026", "10")
+        os.makedirs(shard)
+        with open(os.path.join(shard, "20261018000000.md"), 'w') as f:
+            f.write(NoteBody(title="Sharded").to_string())
+        assert wait_for(lambda: folder.titles == ["Sharded"])
+
+        note = folder.notes[0]
+        os.rename(note.filepath, os.path.join(folder.path, "20261018000000.md"))
+        assert wait_for(lambda: [n.filepath for n in folder.notes] == [os.path.join(folder.path, "20261018000000.md")])
+
+        os.remove(os.path.join(folder.path, "20261018000000.md"))
+        assert wait_for(lambda: folder.notes == [])
+    finally:
+        watcher.stop()
+
+
+class FailingWatcher(PollingFolderWatcher):
+
+    def __init__(self, folders, failures):
+        super().__init__(folders, interval=0.01)
+        self.failures = failures
+        self.pulls = 0
+
+    def run(self):
+        # A failing pull doesn't stop the watcher, anything else does
+        while self.pulls < self.failures:
+            self.pulls += 1
+            self.pull(self.folders[0])
+        raise RuntimeError("broken")
+
+
+def test_failing_watcher_stops_watching(tmp_path):
+    folder = NoteFolder(str(tmp_path), NoteType.ZETTEL)
+    (tmp_path / "1.md").write_text("not a note")
+    watcher = FailingWatcher([folder], failures=3)
+    watcher.start()
+    watcher.thread.join(5)
+    assert watcher.pulls == 3
+    assert not folder.watched